@@ -1,9 +1,13 @@
-import json
-import uuid
+import argparse
+import ijson
+import secrets
+from itertools import islice
+from operator import itemgetter
+import torch
 from sentence_transformers import SentenceTransformer
 import chromadb
-from chromadb.utils import embedding_functions
 import os
+from src.core.vector_store import DEFAULT_METRIC, get_or_create_hnsw_collection
 
 # --- 설정 ---
 # 이 파일과 같은 위치에 AI Hub 원본 데이터 파일이 있다고 가정합니다.
@@ -11,9 +15,39 @@ SOURCE_DATA_FILE = 'AI_Hub_감성대화.json'
 DB_PATH = "./data/chromadb"
 COLLECTION_NAME = "teen_empathy_chat"
 MODEL_NAME = 'jhgan/ko-sbert-multitask'
-
-
-def setup_database():
+# add() 한 번에 넣을 문서 수 (작은 배치는 SQLite 트랜잭션 오버헤드가 지배적)
+BATCH_SIZE = 5000
+# 임베딩 인코딩 미니배치 크기
+ENCODE_BATCH_SIZE = 1024
+# 일회성 대량 적재용 SQLite 설정 (--unsafe-fast-load 지정 시에만 적용).
+# 저널은 WAL로 유지해 트랜잭션 원자성은 지키고, fsync만 생략하므로 전원 장애 시 최근 쓰기가 유실될 수 있음
+BULK_INSERT_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA temp_store=MEMORY",
+)
+# 컬렉션 메타데이터로 저장할 원본 필드
+METADATA_KEYS = ('user_utterance', 'system_response', 'emotion', 'relationship')
+
+
+def apply_bulk_insert_pragmas(client):
+    """ChromaDB 내부 SQLite 연결에 대량 적재용 pragma 적용 (비공개 내부 구조라 버전에 따라 없을 수 있음)"""
+    target = client
+    for attr in ("_server", "_sysdb", "_conn_pool"):
+        if not hasattr(target, attr):
+            print(f"경고: 이 ChromaDB 버전에는 '{attr}' 내부 속성이 없어 pragma 설정을 건너뜁니다.")
+            return
+        target = getattr(target, attr)
+    try:
+        conn = target.connect()
+        for pragma in BULK_INSERT_PRAGMAS:
+            conn.execute(pragma)
+        print("SQLite 대량 적재 설정 적용 완료.")
+    except Exception as e:
+        print(f"경고: SQLite pragma 설정 실패, 기본 설정으로 계속 진행합니다. ({e})")
+
+
+def setup_database(unsafe_fast_load: bool = False):
     """VectorDB를 설정하고 데이터를 구축하는 메인 함수"""
 
     # 0. 필수 파일 확인
@@ -24,52 +58,58 @@ def setup_database():
 
     print("1. 데이터베이스 및 컬렉션 설정 시작...")
     client = chromadb.PersistentClient(path=DB_PATH)
+    if unsafe_fast_load:
+        apply_bulk_insert_pragmas(client)
 
-    # HuggingFace 임베딩 함수 설정
-    embedding_func = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=MODEL_NAME)
+    # 임베딩은 Chroma 임베딩 함수 대신 직접 계산해서 add()에 전달 (SQLite 쓰기와 인코딩을 분리)
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    model = SentenceTransformer(MODEL_NAME, device=device)
+    print(f"임베딩 모델 로드 완료. (Device: {device})")
 
-    # 컬렉션 생성 또는 가져오기
-    collection = client.get_or_create_collection(
-        name=COLLECTION_NAME,
-        embedding_function=embedding_func,
-        metadata={"hnsw:space": "cosine"}  # 유사도 측정 기준: 코사인 유사도
-    )
+    # 컬렉션 가져오기 또는 생성. 앱(src/core/vector_store.py)과 같은 metric을 쓰고,
+    # hnsw 설정(HNSW_PARAMS)은 생성 시점에만 적용되므로 새로 만들 때만 전달됨
+    collection = get_or_create_hnsw_collection(client, COLLECTION_NAME, DEFAULT_METRIC)
     print(f"'{COLLECTION_NAME}' 컬렉션 준비 완료.")
 
-    # 2. 원본 JSON 데이터 로드
-    print(f"2. '{SOURCE_DATA_FILE}' 파일에서 데이터 로드 중...")
-    with open(SOURCE_DATA_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    print(f"총 {len(data)}개의 대화 데이터 로드 완료.")
+    # 2. 원본 JSON 데이터 스트리밍 로드 (전체를 메모리에 올리지 않고 배치 단위로 파싱)
+    print(f"2. '{SOURCE_DATA_FILE}' 파일에서 데이터 스트리밍 로드 시작...")
 
     # 3. 데이터 배치 처리 및 VectorDB에 추가
     print("3. 데이터 임베딩 및 데이터베이스 저장 시작... (시간이 걸릴 수 있습니다)")
-    batch_size = 100
-    total_batches = (len(data) + batch_size - 1) // batch_size
-
-    for i in range(0, len(data), batch_size):
-        batch_data = data[i:i + batch_size]
-
-        # 문서, 메타데이터, ID 리스트 생성
-        documents = [item['user_utterance'] for item in batch_data]
-        metadatas = [
-            {
-                "user_utterance": item['user_utterance'],
-                "system_response": item['system_response'],
-                "emotion": item['emotion'],
-                "relationship": item.get('relationship', '기타')  # relationship 필드가 없을 경우 대비
-            } for item in batch_data
-        ]
-        ids = [str(uuid.uuid4()) for _ in batch_data]
-
-        # 컬렉션에 데이터 추가
-        collection.add(
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
-
-        print(f"  - 배치 {i // batch_size + 1}/{total_batches} 처리 완료...")
+    total_items = 0
+    get_metadata = itemgetter(*METADATA_KEYS)
+
+    with open(SOURCE_DATA_FILE, 'rb') as f:
+        items = ijson.items(f, 'item')
+        for batch_index, batch_data in enumerate(iter(lambda: list(islice(items, BATCH_SIZE)), []), start=1):
+            # 문서, 메타데이터, ID 리스트 생성
+            for item in batch_data:
+                item.setdefault('relationship', '기타')  # relationship 필드가 없을 경우 대비
+            documents = [item['user_utterance'] for item in batch_data]
+            metadatas = [dict(zip(METADATA_KEYS, get_metadata(item))) for item in batch_data]
+            # 문서별 uuid4() 호출 대신 난수를 한 번에 뽑아 16바이트씩 잘라 ID로 사용
+            id_bytes = secrets.token_bytes(16 * len(batch_data))
+            ids = [id_bytes[j * 16:(j + 1) * 16].hex() for j in range(len(batch_data))]
+
+            # 단위 벡터로 정규화하여 내적만으로 코사인 유사도를 계산
+            embeddings = model.encode(
+                documents,
+                batch_size=ENCODE_BATCH_SIZE,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
+
+            # 컬렉션에 데이터 추가 (임베딩은 배치 단위 float32 ndarray로 유지하고,
+            # chromadb 0.4.x가 리스트만 받으므로 add() 직전에만 현재 배치를 리스트로 변환)
+            collection.add(
+                documents=documents,
+                embeddings=embeddings.tolist(),
+                metadatas=metadatas,
+                ids=ids
+            )
+
+            total_items += len(batch_data)
+            print(f"  - 배치 {batch_index} 처리 완료... (누적 {total_items}개)")
 
     print("🎉 데이터베이스 구축이 성공적으로 완료되었습니다!")
     print(f"총 {collection.count()}개의 문서가 '{COLLECTION_NAME}' 컬렉션에 저장되었습니다.")
@@ -77,4 +117,8 @@ def setup_database():
 
 
 if __name__ == "__main__":
-    setup_database()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="AI Hub 감성대화 데이터로 VectorDB를 구축합니다.")
+    parser.add_argument("--unsafe-fast-load", action="store_true",
+                        help="SQLite fsync를 끄고 적재 (빠르지만 중단/전원 장애 시 최근 쓰기가 유실될 수 있음)")
+    args = parser.parse_args()
+    setup_database(unsafe_fast_load=args.unsafe_fast_load)
\ No newline at end of file
@@ -1,13 +1,19 @@
 # main.py - 에러 수정 버전
 
+import asyncio
+import copy
 import os
+import secrets
 import sys
+import time
 from datetime import datetime
+from functools import lru_cache
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import JSONResponse, HTMLResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
+from loguru import logger
 
 # 환경 변수 로드
 load_dotenv()
@@ -29,7 +35,12 @@ class EnvironmentDetector:
 
     @staticmethod
     def get_environment_config(env_type: str) -> dict:
-        """환경별 설정 반환"""
+        """환경별 설정 반환 (호출자가 수정해도 캐시된 설정이 바뀌지 않도록 복사본을 반환)"""
+        return copy.deepcopy(EnvironmentDetector._build_environment_config(env_type))
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _build_environment_config(env_type: str) -> dict:
         configs = {
             "huggingface": {
                 "debug": False,
@@ -87,6 +98,10 @@ class EnvironmentDetector:
 ENVIRONMENT = EnvironmentDetector.detect_environment()
 CONFIG = EnvironmentDetector.get_environment_config(ENVIRONMENT)
 
+# loguru 기본 싱크(DEBUG)를 환경별 로그 레벨로 교체 (프로덕션은 WARNING: 요청마다 남는 INFO 로그를 포맷하지 않음)
+logger.remove()
+logger.add(sys.stderr, level=CONFIG["log_level"].upper())
+
 print(f"🌍 감지된 환경: {ENVIRONMENT}")
 print(f"📋 설정: {CONFIG['description']}")
 
@@ -97,7 +112,8 @@ app = FastAPI(
     version=os.getenv("VERSION", "2.0.0"),
     docs_url="/docs" if CONFIG["features"]["api_docs"] else None,
     redoc_url="/redoc" if CONFIG["features"]["api_docs"] else None,
-    debug=CONFIG["debug"]
+    debug=CONFIG["debug"],
+    default_response_class=ORJSONResponse  # 디버그 응답처럼 큰 JSON도 빠르게 직렬화
 )
 
 # CORS 설정 (환경별)
@@ -110,6 +126,23 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def log_request(request: Request, call_next):
+    """요청마다 request_id를 로그 컨텍스트에 묶고, 처리가 끝난 뒤 구조화된 로그를 한 번만 남김"""
+    request_id = request.headers.get("x-request-id") or secrets.token_hex(6)
+    start_time = time.perf_counter()
+    with logger.contextualize(request_id=request_id):
+        response = await call_next(request)
+        # 키워드 인자는 메시지 포맷과 동시에 extra 필드로도 기록됨 (JSON 싱크에서 그대로 활용 가능)
+        logger.info(
+            "요청 처리 완료: {method} {path} → {status} ({elapsed_ms}ms)",
+            method=request.method, path=request.url.path, status=response.status_code,
+            elapsed_ms=round((time.perf_counter() - start_time) * 1000, 1)
+        )
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
 def create_default_html(file_path: str):
     """기본 HTML 파일 생성"""
     html_content = get_default_html()
@@ -185,8 +218,7 @@ def add_demo_routes():
 if CONFIG["features"]["static_files"]:
     try:
         static_dir = "static"
-        if not os.path.exists(static_dir):
-            os.makedirs(static_dir)
+        os.makedirs(static_dir, exist_ok=True)
 
         index_path = os.path.join(static_dir, "index.html")
         if not os.path.exists(index_path):
@@ -198,12 +230,14 @@ if CONFIG["features"]["static_files"]:
         print(f"⚠️ 정적 파일 설정 실패: {e}")
 
 # 라우터 등록 (오류 처리 강화)
+API_ROUTERS_LOADED = False
 try:
     from src.api import chat, openai, vector
 
     app.include_router(chat.router, prefix="/api/v1/chat", tags=["💙 Teen Chat"])
     app.include_router(openai.router, prefix="/api/v1/openai", tags=["🤖 OpenAI GPT-4"])
     app.include_router(vector.router, prefix="/api/v1/vector", tags=["🗄️ Vector Store"])
+    API_ROUTERS_LOADED = True
     print("✅ API 라우터 등록 완료")
 except ImportError as e:
     print(f"⚠️ API 라우터 import 실패: {e}")
@@ -215,15 +249,48 @@ except Exception as e:
     add_demo_routes()
 
 
+def load_index_html() -> bytes:
+    """메인 페이지 HTML 로드 (정적 파일이 없으면 기본 HTML)"""
+    html_file_path = "static/index.html"
+    if os.path.exists(html_file_path):
+        with open(html_file_path, "rb") as f:
+            return f.read()
+    return get_default_html().encode("utf-8")
+
+
+# 메인 페이지는 시작 시 한 번만 읽어 캐시 (개발 모드에서는 파일 수정을 바로 반영하기 위해 매번 읽음)
+_INDEX_HTML = None if CONFIG["debug"] else load_index_html()
+
+
+_warm_up_task = None
+
+
+async def _load_embedding_model():
+    try:
+        from src.services.aihub_processor import get_teen_empathy_processor
+
+        # 모델 로드 직후 _load_embedding_model이 더미 배치로 워밍업까지 수행하므로 따로 인코딩하지 않음
+        await get_teen_empathy_processor()
+        print("✅ 임베딩 모델 로드 및 워밍업 완료")
+    except Exception as e:
+        print(f"⚠️ 임베딩 모델 워밍업 실패 (첫 요청 시 다시 로드합니다): {e}")
+
+
+@app.on_event("startup")
+async def warm_up_embedding_model():
+    """임베딩 모델을 백그라운드에서 미리 로드해 첫 요청의 콜드 스타트를 줄임
+    (모델 로드가 느려도 서버 기동과 헬스 체크를 막지 않도록 완료를 기다리지 않음)"""
+    global _warm_up_task
+    if not API_ROUTERS_LOADED:
+        return
+    _warm_up_task = asyncio.create_task(_load_embedding_model())
+
+
 # 기본 라우트들
 @app.get("/", response_class=HTMLResponse)
 async def root():
     """메인 페이지"""
-    html_file_path = "static/index.html"
-    if os.path.exists(html_file_path):
-        with open(html_file_path, "r", encoding="utf-8") as f:
-            return HTMLResponse(content=f.read())
-    return HTMLResponse(content=get_default_html())
+    return HTMLResponse(content=_INDEX_HTML if _INDEX_HTML is not None else load_index_html())
 
 
 @app.get("/api/v1/health")
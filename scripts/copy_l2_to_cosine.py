@@ -5,20 +5,28 @@ import os
 import sys
 from loguru import logger
 import chromadb
+import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
 
 # 스크립트가 src 폴더를 찾을 수 있도록 경로를 추가
 sys.path.append(os.getcwd())
 from src.models.vector_models import DocumentInput
+from src.core.vector_store import DEFAULT_METRIC, get_or_create_hnsw_collection
 
 # --- 설정 ---
 # 원본이 될 기존 컬렉션 이름 (아마도 기본 이름)
 SOURCE_COLLECTION_NAME = "teen_empathy_chat"
-# 새로 만들 코사인 컬렉션 이름
-TARGET_COLLECTION_NAME = "teen_empathy_chat_cosine"
+# 새로 만들 코사인 컬렉션 이름 (앱의 get_vector_store와 같은 "{기본 이름}_{metric}" 규칙)
+TARGET_COLLECTION_NAME = f"{SOURCE_COLLECTION_NAME}_{DEFAULT_METRIC}"
 
 DB_PATH = "./data/chromadb"
-BATCH_SIZE = 100
+# 인코딩 미니배치 크기 (SBERT가 길이순 정렬 후 배치를 구성함)
+ENCODE_BATCH_SIZE = 1024
+# ChromaDB add() 한 번에 넣을 문서 수
+ADD_BATCH_SIZE = 5000
+# 멀티 GPU 인코딩 시 워커 하나에 넘길 문서 수
+MULTI_PROCESS_CHUNK_SIZE = 5000
 EMBEDDING_MODEL = "jhgan/ko-sbert-multitask"
 CACHE_DIR = "./cache"
 # macOS의 GPU(MPS)를 사용하도록 설정. 실패 시 CPU로 자동 전환됨.
@@ -27,29 +35,57 @@ DEVICE = 'mps'
 
 # -----------------
 
+def encode_documents(embedding_model: SentenceTransformer, documents: list) -> np.ndarray:
+    """
+    문서 전체를 L2 정규화된 임베딩으로 변환합니다.
+    GPU가 여러 장이면 GPU별 워커 프로세스로 나눠 인코딩하고, 그 외(CPU/MPS/단일 GPU)는 한 프로세스에서 인코딩합니다.
+    CPU에서 코어 수만큼 프로세스를 띄우면 각 프로세스의 PyTorch 스레드 풀이 코어를 나눠 쓰며 오히려 느려지므로
+    CPU는 단일 프로세스의 intra-op 스레드 병렬화에 맡깁니다.
+    """
+    if embedding_model.device.type == 'cuda' and torch.cuda.device_count() > 1:
+        target_devices = [f"cuda:{i}" for i in range(torch.cuda.device_count())]
+        pool = embedding_model.start_multi_process_pool(target_devices=target_devices)
+        try:
+            return embedding_model.encode_multi_process(
+                documents, pool, batch_size=ENCODE_BATCH_SIZE, chunk_size=MULTI_PROCESS_CHUNK_SIZE,
+                normalize_embeddings=True
+            )
+        finally:
+            embedding_model.stop_multi_process_pool(pool)
+
+    return embedding_model.encode(
+        documents,
+        batch_size=ENCODE_BATCH_SIZE,
+        show_progress_bar=True,
+        convert_to_numpy=True,
+        normalize_embeddings=True
+    )
+
+
 async def copy_data():
     """
-    기존 L2 컬렉션에서 모든 데이터를 읽어,
+    기존 원본 컬렉션에서 모든 데이터를 읽어,
     새로운 코사인 컬렉션으로 복사(재입력)합니다. (Chroma 0.4.x 호환)
     """
-    logger.info(f"데이터 복사를 시작합니다: '{SOURCE_COLLECTION_NAME}' (L2) -> '{TARGET_COLLECTION_NAME}' (Cosine)")
+    logger.info(f"데이터 복사를 시작합니다: '{SOURCE_COLLECTION_NAME}' -> '{TARGET_COLLECTION_NAME}' ({DEFAULT_METRIC})")
 
     # 1. 최신 버전 클라이언트 생성
     os.makedirs(DB_PATH, exist_ok=True)
     client = chromadb.PersistentClient(path=DB_PATH)
 
-    # 2. 원본(L2) 컬렉션 객체 가져오기
-    try:
-        source_collection = client.get_collection(name=SOURCE_COLLECTION_NAME)
-        logger.info(f"✅ 원본 컬렉션 '{SOURCE_COLLECTION_NAME}'에 성공적으로 연결했습니다.")
-    except ValueError:
+    # 2. 원본 컬렉션 객체 가져오기 (문서와 메타데이터만 읽고 임베딩은 새로 계산하므로 원본 metric은 무관)
+    if SOURCE_COLLECTION_NAME not in {c.name for c in client.list_collections()}:
         logger.error(f"❌ 오류: 원본 컬렉션('{SOURCE_COLLECTION_NAME}')을 찾을 수 없습니다.")
-        logger.error("먼저 .env 파일에서 DB_METRIC=l2 로 설정하고 앱을 한번 실행하여, 기본 L2 컬렉션이 존재하는지 확인하세요.")
+        logger.error("먼저 load_data.py를 실행해 원본 컬렉션을 만들었는지 확인하세요.")
         return
+    source_collection = client.get_collection(name=SOURCE_COLLECTION_NAME)
+    logger.info(f"✅ 원본 컬렉션 '{SOURCE_COLLECTION_NAME}'에 성공적으로 연결했습니다.")
 
     # 3. 대상(코사인) 컬렉션 생성/연결
-    logger.info(f"대상 (Cosine) 컬렉션 '{TARGET_COLLECTION_NAME}'을 생성/연결합니다.")
-    target_collection = client.get_or_create_collection(name=TARGET_COLLECTION_NAME, metadata={"hnsw:space": "cosine"})
+    # 앱(get_vector_store)이 여는 것과 같은 metric으로 생성. 임베딩은 L2 정규화해서 넣으므로
+    # 앱의 유사도 계산(1 - 거리)이 그대로 코사인 유사도가 됨 (normalize_embeddings=True)
+    logger.info(f"대상 ({DEFAULT_METRIC}) 컬렉션 '{TARGET_COLLECTION_NAME}'을 생성/연결합니다.")
+    target_collection = get_or_create_hnsw_collection(client, TARGET_COLLECTION_NAME, DEFAULT_METRIC)
 
     # 4. 원본 컬렉션에서 모든 데이터 읽어오기
     total_docs_count = source_collection.count()
@@ -69,32 +105,36 @@ async def copy_data():
         embedding_model = SentenceTransformer(EMBEDDING_MODEL, cache_folder=CACHE_DIR, device='cpu')
         logger.info(f"✅ 임베딩 모델 '{EMBEDDING_MODEL}'을 로드했습니다. (Device: {embedding_model.device})")
 
+    # GPU(MPS/CUDA)에서는 FP16으로 추론하여 처리량을 높임 (CPU는 FP16 연산이 느리므로 FP32 유지)
+    if embedding_model.device.type != 'cpu':
+        embedding_model = embedding_model.half()
+        logger.info("✅ 임베딩 모델을 FP16으로 변환했습니다.")
+
     # 6. 데이터를 배치 단위로 '새로 임베딩'하여 코사인 컬렉션에 추가
     ids_list = all_data['ids']
     documents_list = all_data['documents']
     metadatas_list = all_data['metadatas']
 
-    logger.info(f"데이터 복사를 시작합니다. 배치 크기: {BATCH_SIZE}")
+    # 전체 문서를 한 번에 인코딩하면 SBERT가 길이순으로 정렬된 미니배치(smart batching)를 구성해 패딩을 최소화함
+    logger.info(f"총 {len(documents_list)}개 문서 임베딩 중... (인코딩 배치 크기: {ENCODE_BATCH_SIZE})")
+    all_embeddings = encode_documents(embedding_model, documents_list)
+
+    logger.info(f"데이터 복사를 시작합니다. 배치 크기: {ADD_BATCH_SIZE}")
     added_count = 0
-    for i in range(0, len(ids_list), BATCH_SIZE):
-        batch_ids = ids_list[i:i + BATCH_SIZE]
-        batch_docs = documents_list[i:i + BATCH_SIZE]
-        batch_metadatas = metadatas_list[i:i + BATCH_SIZE]
+    for i in range(0, len(ids_list), ADD_BATCH_SIZE):
+        batch_ids = ids_list[i:i + ADD_BATCH_SIZE]
 
         try:
-            logger.info(f"배치 {i // BATCH_SIZE + 1}: {len(batch_docs)}개 문서 임베딩 중...")
-            batch_embeddings = embedding_model.encode(batch_docs).tolist()
-
             target_collection.add(
                 ids=batch_ids,
-                documents=batch_docs,
-                embeddings=batch_embeddings,
-                metadatas=batch_metadatas
+                documents=documents_list[i:i + ADD_BATCH_SIZE],
+                embeddings=all_embeddings[i:i + ADD_BATCH_SIZE].tolist(),
+                metadatas=metadatas_list[i:i + ADD_BATCH_SIZE]
             )
             added_count += len(batch_ids)
             logger.info(f"진행 상황: {added_count} / {total_docs_count} 문서 처리 완료...")
         except Exception as e:
-            logger.error(f"배치 {i // BATCH_SIZE + 1} 처리 중 오류 발생: {e}")
+            logger.error(f"배치 {i // ADD_BATCH_SIZE + 1} 처리 중 오류 발생: {e}")
             logger.error("복사를 중단합니다.")
             return
 
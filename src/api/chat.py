@@ -1,22 +1,122 @@
 # src/api/chat.py
 
 from fastapi import APIRouter, Header
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from typing import AsyncIterator, List, Optional, Tuple
+import re
 import traceback
 import asyncio
+from functools import partial
+from datetime import datetime
 from loguru import logger
 from ..services.openai_client import get_openai_client
 from ..services.aihub_processor import get_teen_empathy_processor
-from ..models.function_models import TeenChatRequest, ReActStep
+from ..services.reranker import get_reranker
+from ..services.answer_cache import get_answer_cache
+from ..models.function_models import TeenChatRequest
 from ..services.conversation_service import get_conversation_service
 
 router = APIRouter()
 
 
-async def run_pipeline(session_id: str, message: str) -> dict:
-    """모든 처리 과정을 투명하게 추적하는 최종 파이프라인 (명시적 ReAct 적용)"""
-    openai_client = await get_openai_client()
-    conversation_service = await get_conversation_service()
-    processor = await get_teen_empathy_processor()
+RAG_INITIAL_TOP_K = 3  # 대부분 상위 후보에서 관련 문서가 나오므로 먼저 적게 검색
+RAG_MAX_TOP_K = 10  # 초기 후보가 모두 부적합할 때만 넓혀서 재검색
+RAG_ACCEPT_SIMILARITY = 0.85  # 벡터 유사도가 이 이상이면 LLM 검증 없이 채택
+RAG_REJECT_SIMILARITY = 0.55  # 벡터 유사도가 이 이하이면 LLM 검증 없이 제외
+# 위 두 임계값은 코사인 유사도(0~1) 기준이라, l2처럼 1/(1+d)로 환산하는 metric에서는 적용하지 않음
+RAG_SIMILARITY_TIER_METRICS = ("cosine", "ip")
+RAG_VERIFY_CONCURRENCY = 5  # LLM 관련성 검증 동시 호출 상한 (후보를 넓혀도 OpenAI 호출이 한꺼번에 몰리지 않도록)
+
+_verify_semaphore = asyncio.Semaphore(RAG_VERIFY_CONCURRENCY)
+
+# 인사/맞장구처럼 RAG가 필요 없는 짧은 메시지 (문장부호·웃음 표현만 덧붙은 경우 포함)
+_TRIVIAL_MESSAGE_RE = re.compile(
+    r"^(안녕+|하이+|헬로+|ㅎㅇ|ㅋ+|ㅎ+|응+|웅+|ㅇㅇ|ㅇㅋ|오키|넵+|네+|예|ok(ay)?|고마워+|감사(합니다|해)?|땡큐)[\s.!?~ㅋㅎ]*$",
+    re.IGNORECASE
+)
+
+
+def _react_step(step_type: str, content: str) -> dict:
+    """ReActStep 모델과 같은 형태의 dict (응답 직렬화 전까지 Pydantic 검증을 거치지 않음)"""
+    return {"step_type": step_type, "content": content, "timestamp": datetime.now().isoformat()}
+
+
+async def _collect_stream(token_stream: AsyncIterator[str], chunks: List[str]) -> AsyncIterator[str]:
+    """토큰을 그대로 흘려보내면서 저장용으로 모아둠"""
+    async for token in token_stream:
+        chunks.append(token)
+        yield token
+
+
+async def _single_chunk(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+async def _verify_with_limit(openai_client, message: str, doc: str) -> bool:
+    async with _verify_semaphore:
+        return await openai_client.verify_rag_relevance(message, doc)
+
+
+async def _verify_candidates(openai_client, reranker, message: str, candidates: List[dict],
+                             start_index: int = 0, debug: bool = False,
+                             similarity_tiers: bool = True) -> Tuple[Optional[int], List[str], List[dict]]:
+    """
+    후보 문서들의 관련성을 검증합니다. 로컬 리랭커로 먼저 채점하고, 확신이 없으면 벡터 유사도로 채택/제외를 가른 뒤
+    그 사이 구간의 후보만 LLM으로 병렬 검증합니다.
+    similarity_tiers=False이면(코사인이 아닌 metric) 유사도 임계값을 쓰지 않고 리랭커 다음 바로 모든 후보를 LLM으로 검증합니다.
+    반환값: (선택된 후보의 인덱스 또는 None, 말투 변환된 후보 문서들, 검증 로그)
+    """
+    original_docs = [doc.get("system_response", "") for doc in candidates]
+    converted_docs = [openai_client._apply_simple_conversions(doc) for doc in original_docs]
+    rerank_scores = await reranker.score(message, converted_docs) if reranker else [None] * len(converted_docs)
+    similarity_scores = [doc.get("similarity_score", 0.0) for doc in candidates]
+    relevance_results = [None] * len(converted_docs)
+    tiers = [None] * len(converted_docs)
+
+    selected_index = None
+    best_index = max(range(len(converted_docs)), key=lambda i: rerank_scores[i]) if reranker and converted_docs else None
+    accept_index = next((i for i, score in enumerate(similarity_scores) if score >= RAG_ACCEPT_SIMILARITY), None) \
+        if similarity_tiers else None
+    if best_index is not None and rerank_scores[best_index] >= reranker.threshold:
+        selected_index = best_index
+        relevance_results[best_index], tiers[best_index] = True, "reranker"
+    elif accept_index is not None:
+        selected_index = accept_index
+        relevance_results[accept_index], tiers[accept_index] = True, "similarity-accept"
+    elif converted_docs:
+        band = [i for i, score in enumerate(similarity_scores) if score > RAG_REJECT_SIMILARITY] \
+            if similarity_tiers else list(range(len(converted_docs)))
+        for i in range(len(converted_docs)):
+            if i not in band: relevance_results[i], tiers[i] = False, "similarity-reject"
+        band_results = await asyncio.gather(
+            *[_verify_with_limit(openai_client, message, converted_docs[i]) for i in band]
+        )
+        for i, is_relevant in zip(band, band_results):
+            relevance_results[i], tiers[i] = is_relevant, "llm"
+        selected_index = next((i for i, is_relevant in enumerate(relevance_results) if is_relevant), None)
+
+    verification_logs = [
+        {"candidate": start_index + i + 1, "similarity_score": similarity_score, "rerank_score": rerank_score,
+         "tier": tier, "is_relevant": is_relevant,
+         "original_document": original_doc_content, "converted_document": converted_doc_content}
+        for i, (similarity_score, rerank_score, tier, is_relevant, original_doc_content, converted_doc_content)
+        in enumerate(zip(similarity_scores, rerank_scores, tiers, relevance_results, original_docs, converted_docs))
+    ] if debug else []
+    return selected_index, converted_docs, verification_logs
+
+
+async def run_pipeline(session_id: str, message: str, debug: bool = False, stream: bool = False) -> dict:
+    """
+    모든 처리 과정을 투명하게 추적하는 최종 파이프라인 (명시적 ReAct 적용)
+    debug=False이면 debug_info / react_steps를 만들지 않고 응답만 생성합니다.
+    대화 저장(Step 7)은 응답 전송을 막지 않도록 "finalize" 함수로 반환되며, 호출 측이 BackgroundTask로 실행합니다.
+    stream=True이면 최종 답변 대신 토큰 스트림("response_stream")을 반환하고, finalize는 스트리밍이 끝난 뒤 모인 답변을 저장합니다.
+    """
+    # 서로 독립적인 싱글톤이므로 동시에 조회 (첫 요청에서는 초기화가 겹쳐 진행됨)
+    openai_client, conversation_service, processor, reranker, answer_cache = await asyncio.gather(
+        get_openai_client(), get_conversation_service(), get_teen_empathy_processor(), get_reranker(), get_answer_cache()
+    )
 
     debug_info = {}
     react_steps = []
@@ -24,96 +124,187 @@ async def run_pipeline(session_id: str, message: str) -> dict:
     # Step 1: Context Loading
     session_id = await conversation_service.get_or_create_session(session_id)
     conversation_history = await conversation_service.get_conversation_history(session_id)
-    debug_info["step1_context_loading"] = {"session_id": session_id, "loaded_history": conversation_history}
-
-    # Step 2: Input Analysis
-    react_steps.append(ReActStep(step_type="thought", content="사용자의 입력 의도를 파악하기 위해 감정과 관계 맥락을 분석해야겠다."))
-    analysis_result = await openai_client.analyze_emotion_and_context(message)
-    emotion = analysis_result.get("primary_emotion", "불안")
-    relationship = analysis_result.get("relationship_context", "동급생")
-    react_steps.append(ReActStep(step_type="observation", content=f"분석 결과: 감정='{emotion}', 관계='{relationship}'"))
-    debug_info["step2_input_analysis"] = {"input": message, "output": analysis_result}
-
-    # Step 3: Conversational Query Rewriting
-    react_steps.append(ReActStep(step_type="thought", content="RAG 검색 정확도를 높이기 위해, 이전 대화 내용까지 포함하여 검색어를 재작성해야겠다."))
-    search_query = await openai_client.rewrite_query_with_history(message, conversation_history)
-    react_steps.append(ReActStep(step_type="observation", content=f"재작성된 검색어: '{search_query}'"))
-    debug_info["step3_query_rewriting"] = {"original_message": message, "rewritten_query": search_query}
+    if debug:
+        debug_info["step1_context_loading"] = {"session_id": session_id, "loaded_history": conversation_history}
+
+    use_answer_cache = False  # Step 4에서 결정 (첫 턴 + 비디버그일 때만 시맨틱 캐시 사용)
+
+    async def finalize(final_response: str):
+        # Step 7 대화 저장 및 답변 캐시 기록 (응답 전송이 끝난 뒤 백그라운드에서 호출)
+        await conversation_service.save_conversation_turn(session_id, message, final_response)
+        if use_answer_cache and final_response:
+            answer_cache.store(processor.corpus_version, emotion, relationship, query_embedding, retrieved_ids, final_response)
+
+    def streamed(messages: List[dict], max_tokens: int) -> dict:
+        chunks = []
+        async def finalize_stream():
+            await finalize("".join(chunks))
+        token_stream = openai_client.stream_completion(messages, temperature=0.7, max_tokens=max_tokens)
+        return {"response_stream": _collect_stream(token_stream, chunks), "finalize": finalize_stream}
+
+    # 짧은 인사/맞장구는 분석할 감정도 검색할 사례도 없으므로 전처리·RAG·검증을 건너뛰고 바로 답변
+    if _TRIVIAL_MESSAGE_RE.match(message.strip()):
+        if debug:
+            react_steps.append(_react_step("thought", "짧은 인사나 맞장구이므로 분석과 검색 없이 대화 맥락만으로 바로 답해야겠다."))
+        if stream:
+            return streamed(openai_client.build_direct_messages(message, conversation_history), 400)
+        final_response, final_prompt = await openai_client.create_direct_response(message, conversation_history)
+        if debug:
+            debug_info["step6_generation"] = {
+                "strategy": "Direct-Generation (Trivial-Message)",
+                "A_final_gpt4_prompt": final_prompt,
+                "B_final_response": final_response
+            }
+            debug_info["step7_save_conversation"] = {"user": message, "assistant": final_response}
+        return {"response": final_response, "debug_info": debug_info, "react_steps": react_steps,
+                "finalize": partial(finalize, final_response)}
+
+    # Step 2 + 3: Input Analysis & Conversational Query Rewriting (단일 호출로 통합)
+    if debug:
+        react_steps.append(_react_step("thought", "사용자의 입력 의도를 파악하기 위해 감정과 관계 맥락을 분석하고, RAG 검색 정확도를 높이기 위해 이전 대화 내용까지 포함하여 검색어를 재작성해야겠다."))
+    query_embedding = None
+    if conversation_history:
+        preprocess_result = await openai_client.preprocess(message, conversation_history)
+    else:
+        # 첫 턴에는 검색어가 원본 메시지와 같으므로, LLM 전처리와 동시에 쿼리 임베딩을 미리 계산
+        preprocess_result, query_embedding = await asyncio.gather(
+            openai_client.preprocess(message, conversation_history), processor.embed_query(message)
+        )
+    emotion = preprocess_result.get("primary_emotion", "불안")
+    relationship = preprocess_result.get("relationship_context", "동급생")
+    search_query = preprocess_result["search_query"]
+    if query_embedding is None:
+        # 재작성된 검색어는 한 번만 임베딩해서 초기 검색/확장 검색/캐시 조회에 함께 사용
+        query_embedding = await processor.embed_query(search_query)
+    if debug:
+        react_steps.append(_react_step("observation", f"분석 결과: 감정='{emotion}', 관계='{relationship}'"))
+        react_steps.append(_react_step("observation", f"재작성된 검색어: '{search_query}'"))
+        debug_info["step2_input_analysis"] = {"input": message, "output": preprocess_result}
+        debug_info["step3_query_rewriting"] = {"original_message": message, "rewritten_query": search_query}
 
     # Step 4: RAG Retrieval
-    react_steps.append(ReActStep(step_type="thought", content="재작성된 검색어로 여러 개의 후보 문서를 찾아봐야겠다."))
+    if debug:
+        react_steps.append(_react_step("thought", "재작성된 검색어로 먼저 상위 후보 몇 개만 찾아봐야겠다."))
     expert_responses = await processor.search_similar_contexts(query=search_query, emotion=emotion,
-                                                               relationship=relationship, top_k=10)
-    react_steps.append(ReActStep(step_type="observation", content=f"유사 사례 후보 {len(expert_responses)}건 발견."))
-    debug_info["step4_rag_retrieval"] = {"retrieved_candidates": expert_responses}
-
-    # Step 5: Sequential Relevance Check
-    final_expert_advice = None
-    verification_logs = []
-    react_steps.append(ReActStep(step_type="thought", content="검색된 후보들이 현재 대화와 정말 관련이 있는지 하나씩 순서대로 검증해야겠다."))
-    for i, doc in enumerate(expert_responses):
-        original_doc_content = doc.get("system_response", "")
-        converted_doc_content = openai_client._apply_simple_conversions(original_doc_content)
-        is_relevant = await openai_client.verify_rag_relevance(message, converted_doc_content)
-        verification_logs.append(
-            {"candidate": i + 1, "is_relevant": is_relevant, "original_document": original_doc_content,
-             "converted_document": converted_doc_content})
-        if is_relevant:
-            final_expert_advice = converted_doc_content
-            react_steps.append(ReActStep(step_type="observation", content=f"후보 {i + 1}번이 관련 있음! RAG 전략을 사용하기로 결정했다."))
-            break
-    debug_info["step5_relevance_check"] = {"verification_logs": verification_logs}
+                                                               relationship=relationship, top_k=RAG_INITIAL_TOP_K,
+                                                               query_embedding=query_embedding)
+    if debug:
+        react_steps.append(_react_step("observation", f"유사 사례 후보 {len(expert_responses)}건 발견."))
+
+    # 첫 턴(대화 맥락 없음)만 시맨틱 캐시 사용: 쿼리가 충분히 비슷하고 검색 근거 문서도 겹치면 이전 답변 재사용
+    use_answer_cache = answer_cache is not None and not debug and not conversation_history and query_embedding is not None
+    retrieved_ids = [doc["document_id"] for doc in expert_responses]
+    if use_answer_cache:
+        cached_response = answer_cache.lookup(processor.corpus_version, emotion, relationship, query_embedding, retrieved_ids)
+        if cached_response is not None:
+            save_turn = partial(conversation_service.save_conversation_turn, session_id, message, cached_response)
+            if stream:
+                return {"response_stream": _single_chunk(cached_response), "finalize": save_turn}
+            return {"response": cached_response, "debug_info": debug_info, "react_steps": [], "finalize": save_turn}
+
+    # Step 5: Relevance Check
+    similarity_tiers = processor.metric in RAG_SIMILARITY_TIER_METRICS
+    if debug:
+        react_steps.append(_react_step("thought", "검색된 후보들을 로컬 리랭커로 한 번에 채점하고, 확실한 후보가 없을 때만 LLM으로 검증해야겠다."))
+    selected_index, converted_docs, verification_logs = await _verify_candidates(
+        openai_client, reranker, message, expert_responses, debug=debug, similarity_tiers=similarity_tiers
+    )
+
+    if selected_index is None and len(expert_responses) >= RAG_INITIAL_TOP_K:
+        # 초기 후보가 모두 부적합하면 후보를 넓혀 재검색하고, 아직 검증하지 않은 후보만 추가로 검증
+        if debug:
+            react_steps.append(_react_step("thought", "상위 후보 중 관련 있는 것이 없으니, 후보를 넓혀서 다시 찾아봐야겠다."))
+        widened_responses = await processor.search_similar_contexts(query=search_query, emotion=emotion,
+                                                                    relationship=relationship, top_k=RAG_MAX_TOP_K,
+                                                                    query_embedding=query_embedding)
+        extra_responses = widened_responses[len(expert_responses):]
+        extra_index, extra_docs, extra_logs = await _verify_candidates(
+            openai_client, reranker, message, extra_responses, start_index=len(expert_responses), debug=debug,
+            similarity_tiers=similarity_tiers
+        )
+        if extra_index is not None:
+            selected_index = len(expert_responses) + extra_index
+        converted_docs += extra_docs
+        verification_logs += extra_logs
+        expert_responses = widened_responses
+
+    final_expert_advice = converted_docs[selected_index] if selected_index is not None else None
+    if debug:
+        if final_expert_advice:
+            react_steps.append(_react_step("observation", f"후보 {selected_index + 1}번이 관련 있음! RAG 전략을 사용하기로 결정했다."))
+        debug_info["step4_rag_retrieval"] = {"retrieved_candidates": expert_responses}
+        debug_info["step5_relevance_check"] = {"verification_logs": verification_logs}
 
     # Step 6: Generation (Explicit ReAct)
     final_response = ""
     if final_expert_advice:
         # Step 6-1: 핵심 전략 추출
-        react_steps.append(ReActStep(step_type="thought", content="선택된 참고 자료에서 답변의 핵심 전략을 추출해야겠다."))
+        if debug:
+            react_steps.append(_react_step("thought", "선택된 참고 자료에서 답변의 핵심 전략을 추출해야겠다."))
         core_strategy = await openai_client.extract_core_strategy(final_expert_advice)
-        react_steps.append(ReActStep(step_type="observation", content=f"추출된 핵심 전략: '{core_strategy}'"))
 
         # Step 6-2: 최종 답변 생성
-        react_steps.append(ReActStep(step_type="thought", content="추출된 전략을 바탕으로 최종 공감 답변을 생성해야겠다."))
+        if debug:
+            react_steps.append(_react_step("observation", f"추출된 핵심 전략: '{core_strategy}'"))
+            react_steps.append(_react_step("thought", "추출된 전략을 바탕으로 최종 공감 답변을 생성해야겠다."))
+        if stream:
+            return streamed(openai_client.build_strategy_messages(core_strategy, message, conversation_history), 800)
         final_response, final_prompt = await openai_client.generate_response_from_strategy(
             core_strategy, message, conversation_history
         )
-        debug_info["step6_generation"] = {
-            "strategy": "RAG-Adaptation (Explicit ReAct)",
-            "A_source_advice": final_expert_advice,
-            "B_extracted_strategy": core_strategy,
-            "C_final_gpt4_prompt": final_prompt,
-            "D_final_response": final_response
-        }
+        if debug:
+            debug_info["step6_generation"] = {
+                "strategy": "RAG-Adaptation (Explicit ReAct)",
+                "A_source_advice": final_expert_advice,
+                "B_extracted_strategy": core_strategy,
+                "C_final_gpt4_prompt": final_prompt,
+                "D_final_response": final_response
+            }
     else:
         # RAG 실패 시 직접 생성
-        react_steps.append(ReActStep(step_type="thought", content="관련 있는 참고 자료가 없으므로, 대화 맥락에만 기반하여 직접 답변을 생성해야겠다."))
+        if debug:
+            react_steps.append(_react_step("thought", "관련 있는 참고 자료가 없으므로, 대화 맥락에만 기반하여 직접 답변을 생성해야겠다."))
+        if stream:
+            return streamed(openai_client.build_direct_messages(message, conversation_history), 400)
         final_response, final_prompt = await openai_client.create_direct_response(message, conversation_history)
-        debug_info["step6_generation"] = {
-            "strategy": "Direct-Generation",
-            "A_final_gpt4_prompt": final_prompt,
-            "B_final_response": final_response
-        }
+        if debug:
+            debug_info["step6_generation"] = {
+                "strategy": "Direct-Generation",
+                "A_final_gpt4_prompt": final_prompt,
+                "B_final_response": final_response
+            }
 
-    react_steps.append(ReActStep(step_type="observation", content="최종 응답 생성을 완료했다."))
+    if debug:
+        react_steps.append(_react_step("observation", "최종 응답 생성을 완료했다."))
 
-    # Step 7: Save Conversation
-    await conversation_service.save_conversation_turn(session_id, message, final_response)
-    debug_info["step7_save_conversation"] = {"user": message, "assistant": final_response}
+    # Step 7: Save Conversation (응답 후 백그라운드에서 실행)
+    if debug:
+        debug_info["step7_save_conversation"] = {"user": message, "assistant": final_response}
 
-    return {"response": final_response, "debug_info": debug_info, "react_steps": [r.dict() for r in react_steps]}
+    return {"response": final_response, "debug_info": debug_info, "react_steps": react_steps,
+            "finalize": partial(finalize, final_response)}
 
 
-@router.post("/teen-chat-debug")
+@router.post("/teen-chat-debug", response_class=ORJSONResponse)
 async def teen_chat_debug(request: TeenChatRequest, session_id: str = Header(None)):
     try:
-        return await run_pipeline(session_id, request.message)
+        result = await run_pipeline(session_id, request.message, debug=True)
+        finalize = result.pop("finalize")
+        return ORJSONResponse(result, background=BackgroundTask(finalize))
     except Exception as e:
-        tb_str = traceback.format_exc()
-        logger.error(f"디버깅 파이프라인 실패: {e}\n{tb_str}")
-        return {"error": "Pipeline Error", "error_message": str(e), "debug_info": {"traceback": tb_str}}
+        logger.exception("디버깅 파이프라인 실패")
+        return {"error": "Pipeline Error", "error_message": str(e), "debug_info": {"traceback": traceback.format_exc()}}
 
 
 @router.post("/teen-chat")
 async def teen_chat(request: TeenChatRequest, session_id: str = Header(None)):
     result = await run_pipeline(session_id, request.message)
-    return {"response": result["response"]}
\ No newline at end of file
+    return ORJSONResponse({"response": result["response"]}, background=BackgroundTask(result["finalize"]))
+
+
+@router.post("/teen-chat-stream")
+async def teen_chat_stream(request: TeenChatRequest, session_id: str = Header(None)):
+    """최종 답변을 생성되는 대로 텍스트로 스트리밍하고, 대화 저장은 스트리밍이 끝난 뒤 백그라운드에서 처리"""
+    result = await run_pipeline(session_id, request.message, stream=True)
+    return StreamingResponse(result["response_stream"], media_type="text/plain; charset=utf-8",
+                             background=BackgroundTask(result["finalize"]))
@@ -31,8 +31,6 @@ async def create_completion(
     - 스트리밍 지원 (선택적)
     """
     try:
-        logger.info(f"GPT-4 완성 요청 - 모델: {request.model}, 메시지 수: {len(request.messages)}")
-
         # ChatMessage를 dict로 변환
         messages = [
             {"role": msg.role.value, "content": msg.content}
@@ -72,8 +70,6 @@ async def create_teen_empathy_response(
     - 따뜻하고 지지적인 응답 생성
     """
     try:
-        logger.info(f"청소년 공감 응답 요청: '{user_message[:50]}...'")
-
         response = await openai_client.create_teen_empathy_response(
             user_message=user_message,
             conversation_history=conversation_history,
@@ -103,8 +99,6 @@ async def analyze_emotion(
     - 적절한 공감 전략 추천
     """
     try:
-        logger.info(f"감정 분석 요청: '{request.text[:50]}...'")
-
         response = await openai_client.analyze_emotion_and_context(
             text=request.text,
             additional_context=request.context
@@ -136,8 +130,6 @@ async def generate_react_response(
     - 유사 맥락 정보 활용
     """
     try:
-        logger.info(f"ReAct 응답 요청: '{user_message[:50]}...'")
-
         response_text, react_steps = await openai_client.generate_react_response(
             user_message=user_message,
             similar_contexts=similar_contexts or [],
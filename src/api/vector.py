@@ -5,12 +5,16 @@ ChromaDB 벡터 스토어 관련 엔드포인트들
 
 from fastapi import APIRouter, HTTPException, Depends, status
 from typing import List
+import json
+import os
 import time
 from loguru import logger
 
 from ..core.vector_store import get_vector_store
+from ..utils.cache import TTLCache
 from ..models.vector_models import (
     VectorSearchRequest, VectorSearchResponse,
+    VectorBatchSearchRequest, VectorBatchSearchResponse,
     DocumentAddRequest, DocumentAddResponse,
     VectorStoreStats, SearchResult
 )
@@ -18,6 +22,17 @@ from ..models.vector_models import (
 
 router = APIRouter()
 
+# 동일한 (쿼리, top_k, 필터) 검색 결과 캐시. 키에 corpus_version이 포함되어 문서 추가/삭제 시 자동 무효화
+_search_cache = TTLCache(
+    max_size=int(os.getenv("VECTOR_SEARCH_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("VECTOR_SEARCH_CACHE_TTL", "300"))
+)
+
+
+def _search_cache_key(vector_store, query: str, top_k: int, filter_metadata) -> tuple:
+    return (vector_store.collection_name, vector_store.corpus_version, query, top_k,
+            json.dumps(filter_metadata, sort_keys=True, ensure_ascii=False))
+
 
 @router.post("/search", response_model=VectorSearchResponse)
 async def search_vectors(
@@ -32,15 +47,18 @@ async def search_vectors(
     - top_k 개수만큼 결과 반환
     """
     try:
-        logger.info(f"벡터 검색 요청: '{request.query[:50]}...', top_k: {request.top_k}")
         start_time = time.time()
 
-        # 벡터 검색 실행
-        results = await vector_store.search(
-            query=request.query,
-            top_k=request.top_k,
-            filter_metadata=request.filter_metadata
-        )
+        # 캐시 확인 후 벡터 검색 실행
+        cache_key = _search_cache_key(vector_store, request.query, request.top_k, request.filter_metadata)
+        results = _search_cache.get(cache_key)
+        if results is None:
+            results = await vector_store.search(
+                query=request.query,
+                top_k=request.top_k,
+                filter_metadata=request.filter_metadata
+            )
+            _search_cache.put(cache_key, results)
 
         search_time_ms = (time.time() - start_time) * 1000
 
@@ -59,6 +77,54 @@ async def search_vectors(
         )
 
 
+@router.post("/search-batch", response_model=VectorBatchSearchResponse)
+async def search_vectors_batch(
+    request: VectorBatchSearchRequest,
+    vector_store = Depends(get_vector_store)
+):
+    """
+    🔍 벡터 배치 검색
+
+    - 여러 쿼리를 한 번의 임베딩 배치와 한 번의 벡터 질의로 검색
+    - 캐시에 있는 쿼리는 바로 반환하고, 나머지만 검색
+    """
+    try:
+        start_time = time.time()
+
+        cache_keys = [_search_cache_key(vector_store, q, request.top_k, request.filter_metadata) for q in request.queries]
+        results = [_search_cache.get(key) for key in cache_keys]
+        miss_indices = [i for i, r in enumerate(results) if r is None]
+
+        if miss_indices:
+            miss_results = await vector_store.batch_search(
+                queries=[request.queries[i] for i in miss_indices],
+                top_k=request.top_k,
+                filter_metadata=request.filter_metadata
+            )
+            for i, r in zip(miss_indices, miss_results):
+                results[i] = r
+                _search_cache.put(cache_keys[i], r)
+
+        search_time_ms = (time.time() - start_time) * 1000
+
+        return VectorBatchSearchResponse(
+            results=[
+                VectorSearchResponse(results=r, query=q, total_results=len(r), search_time_ms=search_time_ms)
+                for q, r in zip(request.queries, results)
+            ],
+            total_queries=len(request.queries),
+            cache_hits=len(request.queries) - len(miss_indices),
+            search_time_ms=search_time_ms
+        )
+
+    except Exception as e:
+        logger.error(f"벡터 배치 검색 실패: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"벡터 배치 검색 중 오류가 발생했습니다: {str(e)}"
+        )
+
+
 @router.post("/documents", response_model=DocumentAddResponse)
 async def add_documents(
     request: DocumentAddRequest,
@@ -72,11 +138,10 @@ async def add_documents(
     - 배치 처리로 효율적 추가
     """
     try:
-        logger.info(f"문서 추가 요청: {len(request.documents)}개")
         start_time = time.time()
 
         # 문서 추가 실행
-        document_ids = await vector_store.add_documents(request.documents)
+        document_ids = await vector_store.add_documents(request.documents, batch_size=request.batch_size)
 
         processing_time_ms = (time.time() - start_time) * 1000
 
@@ -99,6 +164,16 @@ async def add_documents(
         )
 
 
+@router.get("/cache-stats")
+async def get_search_cache_stats(vector_store = Depends(get_vector_store)):
+    """
+    ⚡ 검색 캐시 통계
+
+    - 검색 결과 캐시와 쿼리 임베딩 캐시의 적중/미스/축출 횟수 및 적중률
+    """
+    return {"search": _search_cache.stats(), "query_embedding": vector_store.query_cache_stats()}
+
+
 @router.get("/stats", response_model=VectorStoreStats)
 async def get_vector_stats(vector_store = Depends(get_vector_store)):
     """
@@ -0,0 +1,85 @@
+# src/core/onnx_encoder.py
+import json
+import os
+from pathlib import Path
+from typing import List, Union
+import numpy as np
+from loguru import logger
+
+
+class OnnxSentenceEncoder:
+    """
+    SentenceTransformer.encode와 같은 방식으로 호출할 수 있는 ONNX Runtime 인코더.
+    최초 1회 모델을 ONNX로 내보내고 INT8 동적 양자화한 뒤, CPU에서 mean pooling 임베딩을 계산합니다.
+    """
+
+    def __init__(self, model_name: str, cache_dir: str):
+        # optimum / onnxruntime은 선택 의존성이므로 실제로 사용할 때만 import
+        import onnxruntime as ort
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        from transformers import AutoTokenizer
+        # 토크나이저 자체 스레드 풀이 ONNX Runtime 스레드와 경쟁하지 않도록 (Dockerfile 밖에서 실행할 때도 적용)
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+        export_dir = Path(cache_dir) / "onnx" / model_name.replace("/", "__")
+        quantized_path = export_dir / "model_quantized.onnx"
+        if not quantized_path.exists():
+            logger.info(f"ONNX 모델이 없어 내보내기 및 INT8 양자화를 진행합니다: {export_dir}")
+            model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True, cache_dir=cache_dir)
+            model.save_pretrained(export_dir)
+            quantizer = ORTQuantizer.from_pretrained(export_dir)
+            quantizer.quantize(save_dir=export_dir,
+                               quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False))
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, cache_dir=cache_dir)
+        self.max_seq_length = self._load_max_seq_length(model_name, cache_dir)
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = os.cpu_count() or 1
+        # 단일 그래프를 순차 실행하므로 inter-op 풀은 1개면 충분 (intra-op 스레드와 코어 경쟁 방지)
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(str(quantized_path), sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.device = "cpu (onnxruntime int8)"
+
+    def _load_max_seq_length(self, model_name: str, cache_dir: str) -> int:
+        # SentenceTransformer와 같이 sentence_bert_config.json의 max_seq_length를 따름 (없으면 토크나이저 한도)
+        try:
+            local_config = Path(model_name) / "sentence_bert_config.json"
+            if local_config.exists():
+                config_path = local_config
+            else:
+                from huggingface_hub import hf_hub_download
+                config_path = hf_hub_download(model_name, "sentence_bert_config.json", cache_dir=cache_dir)
+            with open(config_path, encoding="utf-8") as f:
+                max_seq_length = json.load(f).get("max_seq_length")
+            if max_seq_length: return int(max_seq_length)
+        except Exception as e:
+            logger.warning(f"⚠️ sentence_bert_config.json을 읽지 못해 토크나이저 최대 길이를 사용합니다: {e}")
+        return min(self.tokenizer.model_max_length, 512)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.session.get_outputs()[0].shape[-1]
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, normalize_embeddings: bool = False,
+               **kwargs) -> np.ndarray:
+        if isinstance(sentences, str): sentences = [sentences]
+        # 길이순으로 정렬해 비슷한 길이끼리 배치를 묶으면 패딩 토큰 연산이 줄어듦 (끝에서 원래 순서로 복원)
+        order = np.argsort([-len(s) for s in sentences], kind="stable")
+        sorted_sentences = [sentences[i] for i in order]
+        batches = []
+        for start in range(0, len(sorted_sentences), batch_size):
+            inputs = self.tokenizer(sorted_sentences[start:start + batch_size], padding=True, truncation=True,
+                                    max_length=self.max_seq_length, return_tensors="np")
+            feeds = {name: value.astype(np.int64) for name, value in inputs.items() if name in self.input_names}
+            token_embeddings = self.session.run(None, feeds)[0]
+            # attention mask 기준 mean pooling (ko-sbert 계열의 pooling 설정과 동일)
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            batches.append(embeddings.astype(np.float32))
+        if not batches: return np.zeros((0, self.get_sentence_embedding_dimension()), np.float32)
+        embeddings = np.empty((len(sentences), batches[0].shape[1]), dtype=np.float32)
+        embeddings[order] = np.concatenate(batches)
+        if normalize_embeddings:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings
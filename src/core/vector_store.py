@@ -1,37 +1,111 @@
 # src/core/vector_store.py
+import asyncio
 import chromadb
+import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any, Optional
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Optional
 from loguru import logger
 import os
+import threading
+import time
 import uuid
 from datetime import datetime
 from ..models.vector_models import SearchResult, DocumentInput, VectorStoreStats
+from ..utils.cache import TTLCache
+from .onnx_encoder import OnnxSentenceEncoder
+
+# 임베딩 모델은 (백엔드, 모델명, 디바이스)별로 프로세스당 한 번만 로드해 모든 ChromaVectorStore 인스턴스가 공유
+_MODEL_CACHE: Dict[tuple, Any] = {}
+_MODEL_LOCK = threading.Lock()
+
+_TORCH_THREADS_CONFIGURED = False
+
+
+def _configure_torch_threads():
+    """컨테이너에서는 PyTorch 기본 스레드 수가 1로 잡히는 경우가 있어, CPU 인코딩 전에 코어 수만큼 명시적으로 설정"""
+    global _TORCH_THREADS_CONFIGURED
+    if _TORCH_THREADS_CONFIGURED: return
+    num_threads = int(os.getenv("TORCH_NUM_THREADS", os.cpu_count() or 4))
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(max(1, num_threads // 2))
+    except RuntimeError:
+        pass  # 이미 병렬 작업이 시작된 뒤에는 변경할 수 없음
+    _TORCH_THREADS_CONFIGURED = True
+    logger.info(f"PyTorch CPU 스레드 수: {torch.get_num_threads()}")
+
+# 앱과 scripts/copy_l2_to_cosine.py가 같은 거리 방식으로 컬렉션을 만들고 읽도록 공유하는 기본 metric
+DEFAULT_METRIC = "cosine"
+
+# 기본값(ef_construction=100, search_ef=10)은 작은 테스트 컬렉션 기준이라 수만~수십만 건 규모에 맞게 조정
+HNSW_PARAMS = {
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 100,
+    "hnsw:M": 16,
+    "hnsw:num_threads": os.cpu_count() or 1,
+}
+
+
+def get_or_create_hnsw_collection(client, name: str, metric: str):
+    """기존 컬렉션은 그대로 열고, 없을 때만 HNSW_PARAMS로 생성
+    (Chroma는 생성 시점의 hnsw 설정만 적용하므로 기존 컬렉션에 새 값을 넘겨도 반영되지 않음)"""
+    # 존재 여부는 예외 대신 컬렉션 목록으로 확인 (컬렉션 수가 적어 목록 조회가 저렴함)
+    if name in {c.name for c in client.list_collections()}:
+        return client.get_collection(name=name)
+    return client.create_collection(name=name, metadata={"hnsw:space": metric, **HNSW_PARAMS})
 
 class ChromaVectorStore:
-    def __init__(self, collection_name: str, metric: str = 'l2', device: str = 'cpu'):
+    def __init__(self, collection_name: str, metric: str = DEFAULT_METRIC, device: str = 'cpu'):
         self.collection_name = collection_name
         self.metric = metric
         self.device = device
         self.client = None
         self.collection = None
         self.embedding_model = None
+        self.corpus_version = 0  # 문서가 추가/삭제될 때마다 증가 (답변 캐시 무효화용)
+        # 문서 수가 이 값 이하이면 HNSW 대신 메모리에 올린 (N, D) 행렬로 전수 내적 검색 (기본 0 = 비활성화)
+        # 스냅샷은 워커마다 따로 들고 있으므로, 다른 워커/load_data.py의 쓰기는 문서 수 재확인으로만 감지됨
+        self.brute_force_max_docs = int(os.getenv("BRUTE_FORCE_MAX_DOCS", "0"))
+        self._brute_force_index = None
+        self._brute_force_version = None
+        self._brute_force_count = None
+        # collection.count()도 SQLite 조회이므로 짧게 캐시. 다른 워커나 load_data.py가 쓴 문서도 반영되도록
+        # 자기 프로세스의 쓰기(corpus_version) 외에 TTL이 지나도 다시 셈
+        self.doc_count_ttl = float(os.getenv("DOC_COUNT_CACHE_TTL", "5"))
+        self._doc_count = None
+        self._doc_count_version = None
+        self._doc_count_checked_at = 0.0
+        # 대량 추가 시 collection.add 한 번에 넣을 문서 수와 동시에 실행할 add 호출 수
+        # (SQLite 쓰기는 어차피 한 번에 하나씩 직렬화되므로 기본은 1개. 인코딩과 겹치는 것만으로 충분)
+        self.add_batch_size = int(os.getenv("VECTOR_ADD_BATCH_SIZE", "5000"))
+        self.add_concurrency = max(1, int(os.getenv("VECTOR_ADD_CONCURRENCY", "1")))
+        # 같은 쿼리 문자열은 인코더를 다시 돌리지 않도록 임베딩을 LRU로 보관 (모델이 고정이므로 만료 없음)
+        self._query_embedding_cache = TTLCache(max_size=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024")), ttl_seconds=0)
+        # 동시 요청의 쿼리를 이 시간(ms) 동안 모아 한 번의 배치 인코딩으로 처리 (기본 0 = 요청마다 바로 인코딩).
+        # 켜면 캐시되지 않은 모든 쿼리가 이만큼 기다리므로, 동시 요청이 많아 배치 이득이 지연보다 클 때만 사용
+        self.query_batch_window = float(os.getenv("QUERY_BATCH_WINDOW_MS", "0")) / 1000.0
+        self._pending_queries: Dict[str, asyncio.Future] = {}
+        self._query_flush_task: Optional[asyncio.Task] = None
         self.model_name = os.getenv("EMBEDDING_MODEL", "jhgan/ko-sbert-multitask")
         self.cache_dir = os.getenv("HF_HOME", "/app/cache")
         self.db_path = os.getenv("CHROMADB_PATH", "/app/data/chromadb")
+        # EMBEDDING_BACKEND=onnx이면 CPU에서 ONNX Runtime INT8 인코더 사용 (optimum/onnxruntime이 없거나 실패하면 SentenceTransformer).
+        # 양자화로 임베딩 공간이 달라지므로, 저장된 코퍼스를 같은 백엔드로 다시 색인한 경우에만 켤 것 (기본은 FP32 torch)
+        self.onnx_backend = os.getenv("EMBEDDING_BACKEND", "torch").lower() == "onnx"
+        self.half_precision = os.getenv("EMBEDDING_HALF_PRECISION", "true").lower() == "true"
 
     async def initialize(self):
         try:
             logger.info(f"'{self.collection_name}' ({self.metric} 방식) Vector Store 초기화 시작...")
             os.makedirs(self.db_path, exist_ok=True)
-            self.client = chromadb.PersistentClient(path=self.db_path)
-            self.embedding_model = SentenceTransformer(
-                self.model_name, cache_folder=self.cache_dir, device=self.device
-            )
+            # 클라이언트 생성(SQLite 마이그레이션)과 컬렉션 로드(HNSW 인덱스 읽기)도 디스크 I/O이므로 워커 스레드에서 실행
+            self.client = await asyncio.to_thread(chromadb.PersistentClient, path=self.db_path)
+            self.embedding_model = await asyncio.to_thread(self._load_embedding_model)
             logger.info(f"임베딩 모델 로드 완료. 사용 디바이스: {self.embedding_model.device}")
-            self.collection = self.client.get_or_create_collection(
-                name=self.collection_name,
-                metadata={"hnsw:space": self.metric}
+            self.collection = await asyncio.to_thread(
+                get_or_create_hnsw_collection, self.client, self.collection_name, self.metric
             )
             logger.info(f"✅ 컬렉션 연결/생성 완료: {self.collection_name} ({self.metric} 방식)")
         except Exception as e:
@@ -43,44 +117,321 @@ class ChromaVectorStore:
                 logger.error(f"❌ '{self.collection_name}' 초기화 실패: {e}")
                 raise
 
-    def _calculate_similarity_from_distance(self, distance: float) -> float:
-        return (1 - distance) if self.metric == 'cosine' else (1 / (1 + distance))
+    def _load_embedding_model(self):
+        with _MODEL_LOCK:
+            if self.onnx_backend and self.device == 'cpu':
+                onnx_key = ("onnx", self.model_name, self.device)
+                if onnx_key not in _MODEL_CACHE:
+                    encoder = self._load_onnx_encoder()
+                    if encoder is not None: _MODEL_CACHE[onnx_key] = self._warm_up(encoder)
+                if onnx_key in _MODEL_CACHE: return _MODEL_CACHE[onnx_key]
+            torch_key = ("torch", self.model_name, self.device)
+            if torch_key not in _MODEL_CACHE:
+                if self.device == 'cpu': _configure_torch_threads()
+                # GPU/MPS에서는 FP16 가중치로 메모리 대역폭을 절반으로 (CPU는 FP16 연산이 오히려 느려 FP32 유지)
+                model = SentenceTransformer(self.model_name, cache_folder=self.cache_dir, device=self.device)
+                if self.device != 'cpu' and self.half_precision: model.half()
+                _MODEL_CACHE[torch_key] = self._warm_up(model)
+            return _MODEL_CACHE[torch_key]
+
+    @staticmethod
+    def _warm_up(model):
+        # 첫 사용자 요청이 메모리 할당/커널 초기화 비용을 떠안지 않도록 로드 직후 더미 배치를 한 번 인코딩
+        try:
+            model.encode(["워밍업 문장입니다."] * 8, batch_size=8, normalize_embeddings=True, show_progress_bar=False)
+        except Exception as e:
+            logger.warning(f"⚠️ 임베딩 모델 워밍업 실패 (요청 처리에는 영향 없음): {e}")
+        return model
+
+    def _load_onnx_encoder(self) -> Optional[OnnxSentenceEncoder]:
+        try:
+            return OnnxSentenceEncoder(self.model_name, cache_dir=self.cache_dir)
+        except Exception as e:
+            logger.warning(f"⚠️ ONNX 인코더를 사용할 수 없어 SentenceTransformer로 대체합니다: {e}")
+            return None
+
+    def _calculate_similarity_from_distance(self, distances: List[float]) -> List[float]:
+        # 임베딩이 정규화되어 있으므로 cosine/ip 거리는 모두 1 - dot (SearchResult 범위에 맞게 0~1로 자름)
+        d = np.asarray(distances, dtype=np.float32)
+        scores = (1.0 - d) if self.metric in ('cosine', 'ip') else (1.0 / (1.0 + d))
+        return np.clip(scores, 0.0, 1.0).tolist()
+
+    def _encode_query(self, query: str) -> List[float]:
+        # 앞뒤 공백만 다른 쿼리는 같은 임베딩이므로 하나의 키로 모음
+        query = query.strip()
+        cached = self._query_embedding_cache.get(query)
+        if cached is not None: return list(cached)
+        embedding = self.embedding_model.encode([query], normalize_embeddings=True).tolist()[0]
+        self._query_embedding_cache.put(query, tuple(embedding))
+        return embedding
+
+    def query_cache_stats(self) -> dict:
+        return self._query_embedding_cache.stats()
+
+    async def embed_query(self, query: str) -> List[float]:
+        """쿼리 임베딩을 워커 스레드에서 계산 (다른 비동기 작업과 동시에 실행 가능)"""
+        if self.query_batch_window <= 0: return await asyncio.to_thread(self._encode_query, query)
+        query = query.strip()
+        cached = self._query_embedding_cache.get(query)
+        if cached is not None: return list(cached)
+        future = self._pending_queries.get(query)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending_queries[query] = loop.create_future()
+            if self._query_flush_task is None:
+                self._query_flush_task = loop.create_task(self._flush_pending_queries())
+                self._query_flush_task.add_done_callback(self._release_pending_queries)
+        # 같은 쿼리를 기다리는 다른 요청이 취소되어도 공유 future는 취소되지 않도록 shield
+        return list(await asyncio.shield(future))
+
+    async def _flush_pending_queries(self):
+        pending: Dict[str, asyncio.Future] = {}
+        try:
+            await asyncio.sleep(self.query_batch_window)
+            pending, self._pending_queries = self._pending_queries, {}
+            self._query_flush_task = None
+            queries = list(pending)
+            embeddings = await asyncio.to_thread(
+                self.embedding_model.encode, queries, batch_size=len(queries),
+                normalize_embeddings=True, show_progress_bar=False
+            )
+            for query, embedding in zip(queries, embeddings.tolist()):
+                self._query_embedding_cache.put(query, tuple(embedding))
+                if not pending[query].done(): pending[query].set_result(embedding)
+        except Exception as e:
+            for future in pending.values():
+                if not future.done(): future.set_exception(e)
+        finally:
+            # CancelledError는 Exception이 아니므로 인코딩 중 취소되면 여기서 넘겨받은 future를 취소해 요청이 영원히 기다리지 않도록 함
+            for future in pending.values():
+                if not future.done(): future.cancel()
 
-    async def search(self, query: str, top_k: int = 5, filter_metadata: Optional[Dict[str, Any]] = None) -> List[SearchResult]:
+    def _release_pending_queries(self, task: asyncio.Task):
+        # 대기열을 넘겨받기 전에 끝난 flush(sleep 중 취소, 시작 전 취소)는 finally도 실행되지 않을 수 있으므로
+        # 완료 콜백에서 남은 대기열을 비우고 다음 쿼리가 새 flush를 예약할 수 있게 함
+        if self._query_flush_task is not task: return
+        pending, self._pending_queries = self._pending_queries, {}
+        self._query_flush_task = None
+        for future in pending.values():
+            if not future.done(): future.cancel()
+
+    async def search(self, query: str, top_k: int = 5, filter_metadata: Optional[Dict[str, Any]] = None,
+                     query_embedding: Optional[List[float]] = None, include_documents: bool = True) -> List[SearchResult]:
+        if not self.collection: raise ValueError("컬렉션이 초기화되지 않았습니다")
+        # 빈 컬렉션이면 인코딩 없이 바로 반환
+        if top_k <= 0: return []
+        doc_count = await self._get_document_count()
+        if doc_count == 0: return []
+        # 인코딩과 HNSW 검색은 동기 호출이므로 워커 스레드에서 실행해 이벤트 루프를 막지 않음
+        if query_embedding is None:
+            query_embedding = await self.embed_query(query)
+        if self._can_brute_force(filter_metadata):
+            index = await self._get_brute_force_index()
+            if index is not None:
+                return self._brute_force_search(index, query_embedding, top_k, filter_metadata)
+        # 메타데이터만 쓰는 호출자는 문서 본문을 받지 않아 Chroma가 결과를 만들며 복사하는 양을 줄임
+        include = ["documents", "metadatas", "distances"] if include_documents else ["metadatas", "distances"]
+        results = await asyncio.to_thread(
+            self.collection.query, query_embeddings=[query_embedding], n_results=min(top_k, doc_count),
+            where=filter_metadata, include=include
+        )
+        return self._to_search_results(results, 0)
+
+    async def batch_search(self, queries: List[str], top_k: int = 5,
+                           filter_metadata: Optional[Dict[str, Any]] = None) -> List[List[SearchResult]]:
+        """여러 쿼리를 한 번의 배치 인코딩과 한 번의 HNSW 질의로 검색 (쿼리 순서대로 결과 반환)"""
         if not self.collection: raise ValueError("컬렉션이 초기화되지 않았습니다")
-        query_embedding = self.embedding_model.encode([query]).tolist()[0]
-        results = self.collection.query(query_embeddings=[query_embedding], n_results=top_k, where=filter_metadata)
-        
-        search_results = []
-        if results and results.get("ids", [[]])[0]:
-            for i in range(len(results["ids"][0])):
-                search_results.append(SearchResult(
-                    content=results["documents"][0][i],
-                    metadata=results["metadatas"][0][i],
-                    score=self._calculate_similarity_from_distance(results["distances"][0][i]),
-                    document_id=results["ids"][0][i]
-                ))
-        search_results.sort(key=lambda x: x.score, reverse=True)
-        return search_results
-
-    async def add_documents(self, documents: List[DocumentInput]) -> List[str]:
+        if not queries: return []
+        doc_count = await self._get_document_count()
+        if top_k <= 0 or doc_count == 0: return [[] for _ in queries]
+        embeddings = (await asyncio.to_thread(
+            self.embedding_model.encode, queries, batch_size=len(queries), normalize_embeddings=True
+        )).tolist()
+        results = await asyncio.to_thread(
+            self.collection.query, query_embeddings=embeddings, n_results=min(top_k, doc_count), where=filter_metadata
+        )
+        return [self._to_search_results(results, q) for q in range(len(queries))]
+
+    async def _get_document_count(self) -> int:
+        # 캐시된 0은 믿지 않음 (빈 컬렉션의 count()는 싸고, 오래된 0으로 검색을 건너뛰면 안 됨)
+        if (not self._doc_count or self._doc_count_version != self.corpus_version
+                or time.monotonic() - self._doc_count_checked_at > self.doc_count_ttl):
+            self._doc_count = await asyncio.to_thread(self.collection.count)
+            self._doc_count_version = self.corpus_version
+            self._doc_count_checked_at = time.monotonic()
+        return self._doc_count
+
+    def _can_brute_force(self, where: Optional[Dict[str, Any]]) -> bool:
+        if self.brute_force_max_docs <= 0 or self.metric not in ('cosine', 'ip'): return False
+        if not where: return True
+        # 스칼라 값에 대한 $eq / $and 조합 필터만 직접 평가하고, 그 외 연산자는 Chroma에 맡김
+        conditions = where["$and"] if set(where) == {"$and"} else [where]
+
+        def is_scalar_eq(v) -> bool:
+            if isinstance(v, dict):
+                if set(v) != {"$eq"}: return False
+                v = v["$eq"]
+            return isinstance(v, (str, int, float, bool))
+
+        return all(isinstance(c, dict) and all(not k.startswith("$") and is_scalar_eq(v) for k, v in c.items())
+                   for c in conditions)
+
+    async def _get_brute_force_index(self) -> Optional[Dict[str, Any]]:
+        # 자기 쓰기(corpus_version) 외에, TTL로 다시 센 문서 수가 스냅샷과 다르면 외부 변경으로 보고 다시 로드
+        doc_count = await self._get_document_count()
+        if self._brute_force_version != self.corpus_version or self._brute_force_count != doc_count:
+            self._brute_force_index = await asyncio.to_thread(self._load_brute_force_index)
+            self._brute_force_version = self.corpus_version
+            self._brute_force_count = doc_count
+        return self._brute_force_index
+
+    def _load_brute_force_index(self) -> Optional[Dict[str, Any]]:
+        count = self.collection.count()
+        if count == 0 or count > self.brute_force_max_docs: return None
+        data = self.collection.get(include=["embeddings", "documents", "metadatas"])
+        logger.info(f"전수 검색용 임베딩 행렬 로드: {count}개 문서")
+        embeddings = np.ascontiguousarray(data["embeddings"], dtype=np.float32)
+        if self.metric == 'cosine':
+            # 기존 컬렉션에는 정규화하지 않고 넣은 벡터가 있으므로, Chroma의 cosine 거리와 같도록 로드 시 한 번 단위 벡터로 변환
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        index = {
+            "ids": data["ids"], "documents": data["documents"], "metadatas": data["metadatas"],
+            "embeddings": embeddings,
+            # 필터 조건별 후보 인덱스. 같은 (감정, 관계) 필터가 반복되므로 메타데이터 전수 비교는 조건당 한 번만 (인덱스와 함께 무효화).
+            # 전수 검색(BRUTE_FORCE_MAX_DOCS > 0)에서만 쓰이며, 기본 HNSW 경로의 where 필터는 Chroma가 매 쿼리 평가함
+            "filter_candidates": TTLCache(max_size=256, ttl_seconds=0),
+        }
+        return index
+
+    def _brute_force_search(self, index: Dict[str, Any], query_embedding: List[float], top_k: int,
+                            where: Optional[Dict[str, Any]]) -> List[SearchResult]:
+        scores = index["embeddings"] @ np.asarray(query_embedding, dtype=np.float32)
+        candidates = np.arange(len(scores))
+        if where:
+            conditions = where["$and"] if set(where) == {"$and"} else [where]
+            expected = tuple(sorted(((k, v["$eq"] if isinstance(v, dict) else v) for c in conditions for k, v in c.items()), key=lambda kv: kv[0]))
+            candidates = index["filter_candidates"].get(expected)
+            if candidates is None:
+                candidates = np.fromiter(
+                    (i for i, m in enumerate(index["metadatas"]) if m and all(m.get(k) == v for k, v in expected)), dtype=np.int64
+                )
+                index["filter_candidates"].put(expected, candidates)
+            if candidates.size == 0: return []
+        k = min(top_k, candidates.size)
+        top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [SearchResult(
+            content=index["documents"][i],
+            metadata=index["metadatas"][i] or {},
+            score=min(max(float(scores[i]), 0.0), 1.0),
+            document_id=index["ids"][i]
+        ) for i in top]
+
+    def _to_search_results(self, results: Dict[str, Any], q: int) -> List[SearchResult]:
+        # Chroma는 거리 오름차순으로 반환하고 거리→유사도 변환은 단조 감소이므로 다시 정렬할 필요 없음
+        if not results or not results.get("ids") or not results["ids"][q]: return []
+        ids, metadatas = results["ids"][q], results["metadatas"][q]
+        documents = results["documents"][q] if results.get("documents") else [""] * len(ids)
+        scores = self._calculate_similarity_from_distance(results["distances"][q])
+        return [
+            SearchResult(content=documents[i], metadata=metadatas[i] or {}, score=scores[i], document_id=ids[i])
+            for i in range(len(ids))
+        ]
+
+    async def add_documents(self, documents: Iterable[DocumentInput], batch_size: int = 64) -> List[str]:
         if not self.collection: raise ValueError("컬렉션이 초기화되지 않았습니다")
-        texts = [doc.content for doc in documents]
-        metadatas = [doc.metadata or {} for doc in documents]
-        document_ids = [doc.document_id or str(uuid.uuid4()) for doc in documents]
-        embeddings = self.embedding_model.encode(texts).tolist()
-        self.collection.add(embeddings=embeddings, documents=texts, metadatas=metadatas, ids=document_ids)
+        # chromadb는 빈 메타데이터를 거부하므로 색인 시각과 길이를 항상 기록 (시각은 호출 전체에 한 번만 계산)
+        now_iso = datetime.now().isoformat()
+        document_ids: List[str] = []
+        # 임베딩(CPU)과 collection.add(디스크 I/O)를 겹쳐 실행하는 2단계 파이프라인. 큐 크기로 메모리에 쌓이는 배치 수를 제한
+        # 텍스트/메타데이터/ID도 배치 단위로만 만들어, 제너레이터로 넘기면 전체 입력을 메모리에 올리지 않음
+        queue = asyncio.Queue(maxsize=2)
+
+        # Chroma가 한 번의 add에 받는 최대 건수(max_batch_size)를 넘지 않도록 제한
+        add_batch_size = min(self.add_batch_size, self.client.max_batch_size)
+
+        async def embed_stage():
+            docs = iter(documents)
+            while chunk := list(islice(docs, add_batch_size)):
+                texts = [doc.content for doc in chunk]
+                metadatas = [{**(doc.metadata or {}), "indexed_at": now_iso, "content_length": len(text)}
+                             for doc, text in zip(chunk, texts)]
+                ids = [doc.document_id or uuid.uuid4().hex for doc in chunk]
+                document_ids.extend(ids)
+                # AI-Hub 발화에는 같은 문장이 반복되므로 배치 안에서 중복을 제거해 한 번씩만 인코딩한 뒤 원래 위치로 펼침
+                unique_texts = list(dict.fromkeys(texts))
+                # 두 인코더 모두 길이순 정렬 후 배치 인코딩 (smart batching)
+                embeddings = await asyncio.to_thread(
+                    self.embedding_model.encode, unique_texts, batch_size=batch_size,
+                    normalize_embeddings=True, show_progress_bar=False
+                )
+                if len(unique_texts) < len(texts):
+                    position = {text: i for i, text in enumerate(unique_texts)}
+                    embeddings = embeddings[[position[text] for text in texts]]
+                await queue.put((texts, embeddings.tolist(), metadatas, ids))
+            for _ in range(self.add_concurrency):
+                await queue.put(None)
+
+        async def upsert_stage():
+            while (item := await queue.get()) is not None:
+                texts, embeddings, metadatas, ids = item
+                await asyncio.to_thread(self.collection.add, embeddings=embeddings, documents=texts,
+                                        metadatas=metadatas, ids=ids)
+
+        tasks = [asyncio.create_task(embed_stage()), *[asyncio.create_task(upsert_stage()) for _ in range(self.add_concurrency)]]
+        try:
+            await asyncio.gather(*tasks)
+        except Exception:
+            for task in tasks: task.cancel()
+            raise
+        finally:
+            self.corpus_version += 1  # 일부 배치만 들어갔더라도 캐시는 무효화
         return document_ids
 
+    async def delete_documents(self, document_ids: List[str]) -> bool:
+        if not self.collection: raise ValueError("컬렉션이 초기화되지 않았습니다")
+        existing = await asyncio.to_thread(self.collection.get, ids=document_ids, include=[])
+        if not existing["ids"]: return False
+        await asyncio.to_thread(self.collection.delete, ids=existing["ids"])
+        self.corpus_version += 1
+        return True
+
+    async def clear_collection(self) -> bool:
+        if not self.client: raise ValueError("컬렉션이 초기화되지 않았습니다")
+        await asyncio.to_thread(self.client.delete_collection, name=self.collection_name)
+        self.collection = await asyncio.to_thread(
+            get_or_create_hnsw_collection, self.client, self.collection_name, self.metric
+        )
+        self.corpus_version += 1
+        logger.warning(f"⚠️ 컬렉션 초기화 완료: {self.collection_name}")
+        return True
+
+    async def get_collection_stats(self) -> VectorStoreStats:
+        if not self.collection: raise ValueError("컬렉션이 초기화되지 않았습니다")
+        total_documents = await asyncio.to_thread(self.collection.count)
+        logger.info(f"쿼리 임베딩 캐시 통계: {self._query_embedding_cache.stats()}")
+        return VectorStoreStats(
+            collection_name=self.collection_name,
+            total_documents=total_documents,
+            embedding_model=self.model_name,
+            embedding_dimension=self.embedding_model.get_sentence_embedding_dimension() if self.embedding_model else None,
+            database_path=self.db_path,
+            status="healthy"
+        )
+
 _vector_store_instances = {}
+_vector_store_init_lock = asyncio.Lock()
 async def get_vector_store() -> ChromaVectorStore:
     global _vector_store_instances
-    metric = os.getenv("DB_METRIC", "cosine").lower()
-    if metric not in _vector_store_instances:
-        base_name = os.getenv("COLLECTION_NAME", "teen_empathy_chat")
-        collection_name = f"{base_name}_{metric}"
-        logger.info(f"환경변수 DB_METRIC='{metric}'에 따라 Vector Store 인스턴스를 생성합니다.")
-        instance = ChromaVectorStore(collection_name=collection_name, metric=metric)
-        await instance.initialize()
-        _vector_store_instances[metric] = instance
+    metric = os.getenv("DB_METRIC", DEFAULT_METRIC).lower()
+    if metric in _vector_store_instances: return _vector_store_instances[metric]
+    # 동시 요청이 각자 초기화하며 모델을 중복 로드하지 않도록 생성 구간을 직렬화 (double-checked locking)
+    async with _vector_store_init_lock:
+        if metric not in _vector_store_instances:
+            base_name = os.getenv("COLLECTION_NAME", "teen_empathy_chat")
+            collection_name = f"{base_name}_{metric}"
+            logger.info(f"환경변수 DB_METRIC='{metric}'에 따라 Vector Store 인스턴스를 생성합니다.")
+            instance = ChromaVectorStore(collection_name=collection_name, metric=metric)
+            await instance.initialize()
+            _vector_store_instances[metric] = instance
     return _vector_store_instances[metric]
\ No newline at end of file
@@ -103,6 +103,30 @@ class VectorSearchResponse(BaseModel):
         }
 
 
+class VectorBatchSearchRequest(BaseModel):
+    """벡터 배치 검색 요청 모델"""
+    queries: List[str] = Field(..., description="검색 쿼리 목록", min_items=1, max_items=64)
+    top_k: int = Field(default=5, description="쿼리당 반환할 결과 수", ge=1, le=20)
+    filter_metadata: Optional[Dict[str, Any]] = Field(default=None, description="모든 쿼리에 공통 적용할 메타데이터 필터")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "queries": ["친구와 싸웠어요", "시험 때문에 불안해"],
+                "top_k": 3,
+                "filter_metadata": {"data_source": "aihub"}
+            }
+        }
+
+
+class VectorBatchSearchResponse(BaseModel):
+    """벡터 배치 검색 응답 모델"""
+    results: List[VectorSearchResponse] = Field(..., description="쿼리별 검색 결과 (요청 순서와 동일)")
+    total_queries: int = Field(..., description="총 쿼리 수")
+    cache_hits: int = Field(default=0, description="캐시에서 바로 반환된 쿼리 수")
+    search_time_ms: float = Field(..., description="전체 검색 소요 시간 (밀리초)")
+
+
 class DocumentAddRequest(BaseModel):
     """문서 추가 요청 모델"""
     documents: List[DocumentInput] = Field(..., description="추가할 문서들", min_items=1)
@@ -1,4 +1,5 @@
 # src/services/aihub_processor.py
+import asyncio
 from typing import Dict, List, Optional
 from loguru import logger
 from ..core.vector_store import get_vector_store
@@ -8,8 +9,16 @@ class TeenEmpathyDataProcessor:
         self.vector_store = vector_store
         logger.info("TeenEmpathyDataProcessor 초기화 완료. Vector Store가 주입되었습니다.")
 
+    async def embed_query(self, query: str) -> Optional[List[float]]:
+        try:
+            return await self.vector_store.embed_query(query)
+        except Exception as e:
+            logger.error(f"❌ 쿼리 임베딩 실패: {e}")
+            return None
+
     async def search_similar_contexts(self, query: str, emotion: Optional[str] = None,
-                                      relationship: Optional[str] = None, top_k: int = 5) -> List[Dict]:
+                                      relationship: Optional[str] = None, top_k: int = 5,
+                                      query_embedding: Optional[List[float]] = None) -> List[Dict]:
         try:
             conditions = []
             if emotion: conditions.append({"emotion": {"$eq": emotion}})
@@ -21,27 +30,38 @@ class TeenEmpathyDataProcessor:
             elif len(conditions) == 1:
                 search_filter = conditions[0]
 
-            logger.info(f"🔍 벡터 검색 시작 - Query: '{query}', Filter: {search_filter}")
             results = await self.vector_store.search(
-                query=query, top_k=top_k, filter_metadata=search_filter
+                query=query, top_k=top_k, filter_metadata=search_filter, query_embedding=query_embedding,
+                include_documents=False  # 발화/응답은 메타데이터에서 읽으므로 문서 본문은 불필요
             )
             formatted_results = [{
                 "user_utterance": r.metadata.get("user_utterance", ""),
                 "system_response": r.metadata.get("system_response", ""),
                 "emotion": r.metadata.get("emotion", ""),
                 "relationship": r.metadata.get("relationship", ""),
-                "similarity_score": r.score
+                "similarity_score": r.score,
+                "document_id": r.document_id
             } for r in results]
-            logger.info(f"✅ 검색 완료: {len(formatted_results)}개 결과")
             return formatted_results
         except Exception as e:
             logger.error(f"❌ 유사 사례 검색 실패: {e}")
             return []
 
+    @property
+    def corpus_version(self) -> int:
+        return self.vector_store.corpus_version
+
+    @property
+    def metric(self) -> str:
+        return self.vector_store.metric
+
 _processor_instance = None
+_processor_init_lock = asyncio.Lock()
 async def get_teen_empathy_processor() -> TeenEmpathyDataProcessor:
     global _processor_instance
-    if _processor_instance is None:
-        vector_store = await get_vector_store()
-        _processor_instance = TeenEmpathyDataProcessor(vector_store=vector_store)
+    if _processor_instance is not None: return _processor_instance
+    async with _processor_init_lock:
+        if _processor_instance is None:
+            vector_store = await get_vector_store()
+            _processor_instance = TeenEmpathyDataProcessor(vector_store=vector_store)
     return _processor_instance
\ No newline at end of file
@@ -0,0 +1,75 @@
+# src/services/answer_cache.py
+import hashlib
+import os
+from typing import Iterable, List, Optional
+import numpy as np
+from loguru import logger
+from ..utils.cache import TTLCache
+
+
+class SemanticAnswerCache:
+    """
+    (감정, 관계, 쿼리 임베딩)을 기준으로 최종 답변을 재사용하는 시맨틱 캐시.
+    쿼리 유사도가 임계값 이상이어도, 이번 검색 결과의 문서 ID 집합이 캐시 당시와 충분히 겹칠 때만 적중으로 인정합니다.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, similarity_threshold: float, jaccard_threshold: float):
+        self.similarity_threshold = similarity_threshold
+        self.jaccard_threshold = jaccard_threshold
+        self._cache = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+
+    @staticmethod
+    def _embedding_hash(embedding: np.ndarray) -> str:
+        # 소수 셋째 자리로 양자화해 사실상 같은 쿼리는 같은 키로 모음
+        return hashlib.blake2b(np.round(embedding, 3).astype(np.float16).tobytes(), digest_size=16).hexdigest()
+
+    @staticmethod
+    def _jaccard(a: frozenset, b: frozenset) -> float:
+        if not a and not b: return 1.0
+        return len(a & b) / len(a | b)
+
+    def lookup(self, corpus_version: int, emotion: str, relationship: str,
+               query_embedding: List[float], document_ids: Iterable[str]) -> Optional[str]:
+        embedding = np.asarray(query_embedding, dtype=np.float32)
+        doc_ids = frozenset(document_ids)
+        bucket = (corpus_version, emotion, relationship)
+
+        best_key, best_response, best_similarity = None, None, self.similarity_threshold
+        for key, (cached_embedding, cached_doc_ids, response) in self._cache.items():
+            if key[:3] != bucket: continue
+            similarity = float(np.dot(embedding, cached_embedding))  # 정규화된 임베딩이므로 내적 = 코사인
+            if similarity >= best_similarity and self._jaccard(doc_ids, cached_doc_ids) >= self.jaccard_threshold:
+                best_key, best_response, best_similarity = key, response, similarity
+
+        if best_key is None:
+            self._cache.record(hit=False)
+            return None
+        self._cache.touch(best_key)
+        self._cache.record(hit=True)
+        logger.debug("⚡ 시맨틱 캐시 적중 (유사도: {:.3f})", best_similarity)
+        return best_response
+
+    def store(self, corpus_version: int, emotion: str, relationship: str,
+              query_embedding: List[float], document_ids: Iterable[str], response: str):
+        embedding = np.asarray(query_embedding, dtype=np.float32)
+        key = (corpus_version, emotion, relationship, self._embedding_hash(embedding))
+        self._cache.put(key, (embedding, frozenset(document_ids), response))
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+_answer_cache_instance = None
+async def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    """시맨틱 캐시 싱글톤. SEMANTIC_CACHE_SIZE=0이면 비활성화(None)"""
+    global _answer_cache_instance
+    if _answer_cache_instance is None:
+        max_size = int(os.getenv("SEMANTIC_CACHE_SIZE", "512"))
+        if max_size <= 0: return None
+        _answer_cache_instance = SemanticAnswerCache(
+            max_size=max_size,
+            ttl_seconds=float(os.getenv("SEMANTIC_CACHE_TTL", "3600")),
+            similarity_threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+            jaccard_threshold=float(os.getenv("SEMANTIC_CACHE_JACCARD", "0.5")),
+        )
+    return _answer_cache_instance
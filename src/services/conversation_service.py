@@ -1,22 +1,49 @@
 """
 간단한 대화 저장 시스템 - SQLite
 """
+import asyncio
+import atexit
 import sqlite3
 import json
-import uuid
+import secrets
 import os
+import threading
 from datetime import datetime
 from typing import List, Dict
 from pathlib import Path
 from contextlib import contextmanager
 from loguru import logger
 
+# 한 턴의 두 행은 timestamp가 같으므로 삽입 순서(id)로 정렬해야 사용자/응답 순서가 유지됨
+# (시작 시 실행 계획 점검에도 같은 쿼리를 사용)
+_HISTORY_QUERY = """
+    SELECT role, content, length(content) AS content_length FROM conversations
+    WHERE session_id = ? ORDER BY id DESC LIMIT ?
+"""
+
 class ConversationService:
     def __init__(self):
         db_path = os.getenv("CONVERSATION_DB_PATH", "/app/data/conversations/conversations.db")
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # 매 호출마다 DB/-wal/-shm 파일을 다시 여는 대신 프로세스당 연결 하나를 재사용 (여러 스레드에서 쓰므로 락으로 직렬화)
+        self._conn = sqlite3.connect(self.db_path, timeout=15.0, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # WAL + synchronous=NORMAL: 커밋마다 fsync하지 않고, 읽기가 쓰기를 기다리지 않음
+        self._conn.executescript("""
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA cache_size=-64000;
+        PRAGMA mmap_size=268435456;
+        """)
+        self._lock = threading.Lock()
+        # 최근 대화 기록의 총 글자 수 상한. 긴 메시지가 이후 모든 GPT 프롬프트의 입력 토큰을 늘리지 않도록 (0이면 개수 제한만 적용)
+        self.history_char_budget = int(os.getenv("HISTORY_CHAR_BUDGET", "3000"))
         self._ensure_tables()
+        self._check_history_query_plan()
+        # 종료 시 PRAGMA optimize로 통계를 갱신해 다음 실행의 쿼리 계획에 반영
+        atexit.register(self._optimize)
         logger.info(f"✅ 대화 DB 초기화: {self.db_path}")
 
     def _ensure_tables(self):
@@ -36,54 +63,62 @@ class ConversationService:
             logger.error(f"❌ DB 테이블 초기화 실패: {e}")
             raise
 
+    def _check_history_query_plan(self):
+        """스키마 변경으로 대화 기록 조회가 세션 인덱스를 타지 않게 되면 경고 (전체 스캔/정렬로 조용히 느려지는 것 방지)"""
+        with self._get_connection() as conn:
+            plan = " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + _HISTORY_QUERY, ("", 1)))
+        if "idx_conversations_session" not in plan or "TEMP B-TREE" in plan:
+            logger.warning(f"⚠️ 대화 기록 조회가 세션 인덱스를 사용하지 않습니다: {plan}")
+
+    def _optimize(self):
+        try:
+            with self._get_connection() as conn:
+                conn.execute("PRAGMA optimize")
+        except Exception as e:
+            logger.warning(f"대화 DB 최적화 실패: {e}")
+
     @contextmanager
     def _get_connection(self):
-        conn = None
-        try:
-            conn = sqlite3.connect(self.db_path, timeout=15.0)
-            conn.row_factory = sqlite3.Row
-            yield conn
-        finally:
-            if conn:
-                conn.close()
+        with self._lock:
+            yield self._conn
 
     async def get_or_create_session(self, session_id: str = None) -> str:
         if session_id: return session_id
-        return f"session_{uuid.uuid4().hex[:12]}"
+        return f"session_{secrets.token_hex(6)}"
 
     async def save_conversation_turn(self, session_id: str, user_message: str, assistant_response: str):
+        # sqlite3 호출은 동기 I/O이므로 워커 스레드에서 실행해 스트리밍 중인 다른 요청의 이벤트 루프를 막지 않음
+        await asyncio.to_thread(self._save_conversation_turn, session_id, user_message, assistant_response)
+
+    def _save_conversation_turn(self, session_id: str, user_message: str, assistant_response: str):
         now = datetime.now().isoformat()
         try:
-            with self._get_connection() as conn:
-                conn.execute("BEGIN")
-                conn.execute(
+            with self._get_connection() as conn, conn:  # 연결 자체를 트랜잭션 컨텍스트로 사용 (예외 시 자동 rollback)
+                # 한 번 준비한 INSERT 문으로 사용자/응답 두 행을 기록
+                conn.executemany(
                     "INSERT INTO conversations (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
-                    (session_id, 'user', user_message, now)
+                    [(session_id, 'user', user_message, now), (session_id, 'assistant', assistant_response, now)]
                 )
-                conn.execute(
-                    "INSERT INTO conversations (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
-                    (session_id, 'assistant', assistant_response, now)
-                )
-                conn.commit()
-            logger.info(f"💾 대화 턴 저장 완료: {session_id}")
         except Exception as e:
             logger.error(f"❌ 대화 턴 저장 실패: {e}")
-            conn.rollback()
 
     async def get_conversation_history(self, session_id: str, limit: int = 6) -> List[Dict[str, str]]:
         """GPT 프롬프트에 사용하기 좋은 형태로 최근 대화 기록을 반환"""
+        return await asyncio.to_thread(self._get_conversation_history, session_id, limit)
+
+    def _get_conversation_history(self, session_id: str, limit: int) -> List[Dict[str, str]]:
         history = []
         try:
             with self._get_connection() as conn:
-                rows = conn.execute("""
-                    SELECT role, content FROM conversations
-                    WHERE session_id = ? ORDER BY timestamp DESC LIMIT ?
-                """, (session_id, limit)).fetchall()
+                rows = conn.execute(_HISTORY_QUERY, (session_id, limit)).fetchall()
 
-                # 시간 역순으로 가져왔으므로 뒤집어서 시간 순으로 정렬
-                for row in reversed(rows):
-                    history.append({"role": row['role'], "content": row['content']})
-            logger.info(f"📚 대화 기록 조회 완료: {session_id}, {len(history)}개 메시지")
+            # 최신 메시지부터 글자 수 예산 안에서만 담고 (최소 1개는 유지), 시간 순으로 뒤집어 반환
+            used = 0
+            for row in rows:
+                used += row['content_length']
+                if history and self.history_char_budget and used > self.history_char_budget: break
+                history.append({"role": row['role'], "content": row['content']})
+            history.reverse()
         except Exception as e:
             logger.warning(f"대화 기록 조회 실패: {e}")
         return history
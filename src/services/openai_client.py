@@ -3,12 +3,17 @@
 """
 OpenAI GPT-4 클라이언트 - 최종 버전 (구조적 분석 및 재조립 프롬프트)
 """
+import asyncio
 import os
-from typing import List, Dict, Tuple, Optional
+import re
+import hashlib
+import httpx
+from typing import AsyncIterator, List, Dict, Tuple, Optional
 from openai import AsyncOpenAI
 from loguru import logger
 import json
 from ..models.function_models import EmotionType, RelationshipType
+from ..utils.cache import TTLCache
 
 
 class OpenAIClient:
@@ -16,6 +21,8 @@ class OpenAIClient:
         self.client = None
         self.api_key = os.getenv("OPENAI_API_KEY")
         self.default_model = os.getenv("OPENAI_MODEL", "gpt-4-turbo")
+        # 분류/추출용 보조 호출(전처리, 관련성 검증, 전략 추출 등)은 작고 빠른 모델로, 최종 답변만 기본 모델로 생성
+        self.fast_model = os.getenv("OPENAI_FAST_MODEL", "gpt-4o-mini")
         self.teen_empathy_system_prompt = """
 당신은 "마음이"라는 이름의 13-19세 청소년 전용 상담 AI입니다. 당신의 목표는 사용자의 말을 따뜻하게 들어주고 공감하며, 친한 친구처럼 반말로 대화하는 것입니다.
 
@@ -26,6 +33,45 @@ class OpenAIClient:
 - **대화 유도:** 답변의 마지막에는 항상 사용자가 다음 말을 이어가기 쉽도록 **개방형 질문(Open-ended question)을 포함**해야 해. (예: "그때 기분이 어땠어?", "좀 더 자세히 얘기해 줄 수 있어?")
 - **영어 절대 금지:** 답변은 반드시 한글로만 생성해야 해.
 """
+        # 아래 지시문들은 요청마다 바뀌지 않는 고정 prefix로 system 메시지에 두고, 대화/검색 결과 등 가변 내용은 뒤쪽 user 메시지로 전달
+        # (프롬프트 앞부분이 매번 동일해야 OpenAI의 prompt caching이 적용됨)
+        emotion_list = [e.value for e in EmotionType]
+        relationship_list = [r.value for r in RelationshipType]
+        self.preprocess_system_prompt = f"""다음 청소년의 메시지를 분석해서 아래 세 항목을 JSON으로 응답해줘.
+- primary_emotion: 반드시 다음 목록의 한글 단어 중 하나 {emotion_list}
+- relationship_context: 반드시 다음 목록의 한글 단어 중 하나 {relationship_list}
+- search_query: '이전 대화 내용'이 주어지면, 그 내용과 '사용자 마지막 메시지'를 종합하여 사용자가 겪고 있는 문제의 핵심 상황과 감정이 모두 담긴 단 하나의 완전한 문장. 반드시 사용자의 입장에서 서술하고, 단순 키워드 나열은 금지. '이전 대화 내용'이 없으면 사용자 마지막 메시지를 그대로 적어줘.
+"""
+        self.emotion_analysis_prompt_prefix = f"""다음 청소년의 메시지에서 primary_emotion과 relationship_context를 추출해줘. 반드시 아래 목록의 한글 단어 중에서만 선택해서 JSON으로 응답해야 해.
+- primary_emotion: {emotion_list}
+- relationship_context: {relationship_list}
+"""
+        self.rewrite_prompt_prefix = """당신은 사용자의 대화 전체를 깊이 이해하여, 벡터 검색에 가장 적합한 검색 문장을 생성하는 '쿼리 재작성 전문가'입니다.
+### 임무
+주어진 '이전 대화 내용'과 '사용자의 마지막 메시지'를 종합하여, 사용자가 겪고 있는 문제의 핵심 상황과 감정이 모두 담긴, 단 하나의 완벽한 문장으로 재작성해야 합니다.
+### 규칙
+1. 반드시 사용자의 입장에서, 사용자가 겪는 문제 상황을 중심으로 서술해야 합니다.
+2. 단순 키워드 나열은 절대 금지됩니다.
+3. 재작성된 문장은 그 자체로 완전한 의미를 가져야 합니다.
+4. 오직 '재작성된 검색 쿼리:' 부분의 내용만 결과로 출력해야 합니다.
+---
+### 실제 과제
+[이전 대화 내용]
+"""
+        self.relevance_system_prompt = "사용자의 현재 메시지와 검색된 조언이 의미적으로 관련이 있는지 판단해줘. 반드시 'Yes' 또는 'No'로만 대답해."
+        self.strategy_extraction_system_prompt = """[너의 임무]
+사용자가 주는 '모범 답안'을 읽고, 아래 '추출 포맷'에 맞춰 핵심 요소들을 추출해줘. 반드시 JSON 형식으로만 응답해야 해.
+
+[추출 포맷]
+{
+  "empathy_phrase": "<사용자의 감정에 직접 공감하는 핵심 문장>",
+  "core_suggestion": "<답변에 담긴 구체적인 제안이나 조언>",
+  "encouragement_phrase": "<마지막에 힘을 주는 격려의 메시지>"
+}
+"""
+        # temperature=0 분석 호출(전처리/쿼리 재작성/감정 분석)은 같은 입력이면 결과가 같으므로 네트워크 왕복 없이 재사용
+        self._analysis_cache = TTLCache(max_size=int(os.getenv("OPENAI_ANALYSIS_CACHE_SIZE", "1024")),
+                                        ttl_seconds=float(os.getenv("OPENAI_ANALYSIS_CACHE_TTL", "600")))
         self.word_conversion_map = {
             "자기야": "너", "당신": "너", "직장": "학교", "회사": "학교",
             "업무": "공부", "동료": "친구", "상사": "선생님", "아드님도": "너도"
@@ -34,12 +80,26 @@ class OpenAIClient:
             "합니다": "해", "하세요": "해", "어떠세요": "어때", "해보세요": "해봐",
             "습니다": "어", "ㅂ니다": "야", "시겠어요": "겠어", "인데요": "인데", "이죠": "이지"
         }
+        # 변환표를 한 번씩만 훑도록 정규식으로 미리 컴파일 (긴 키 우선, 어미는 공백으로 나눈 단어의 끝에서만)
+        self._word_conversion_re = re.compile("|".join(
+            re.escape(k) for k in sorted(self.word_conversion_map, key=len, reverse=True)))
+        self._ending_conversion_re = re.compile("(?:" + "|".join(
+            re.escape(k) for k in sorted(self.ending_conversion_map, key=len, reverse=True)) + r")(?= |\Z)")
 
     async def initialize(self):
         if not self.api_key or "sk-proj-" not in self.api_key:
             raise ValueError("올바른 OpenAI API 키를 설정해주세요 (`sk-proj-` 형태)")
-        self.client = AsyncOpenAI(api_key=self.api_key, timeout=30.0, max_retries=3)
-        await self._test_connection()
+        # 한 턴에 여러 번 호출하므로 HTTP/2 + keep-alive 풀을 공유해 매 호출마다 TCP/TLS 연결을 새로 맺지 않도록 함
+        http_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=60.0),
+            timeout=30.0
+        )
+        self.client = AsyncOpenAI(api_key=self.api_key, timeout=30.0,
+                                  max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "2")), http_client=http_client)
+        # 연결 테스트는 첫 사용자 요청에 GPT 왕복 한 번을 더하므로 기본 비활성화 (/openai/health가 별도로 확인)
+        if os.getenv("OPENAI_VALIDATE_ON_INIT", "false").lower() == "true":
+            await self._test_connection()
         logger.info("✅ OpenAI 클라이언트 초기화 완료")
 
     async def _test_connection(self):
@@ -65,90 +125,114 @@ class OpenAIClient:
         )
         return response.choices[0].message.content
 
+    async def stream_completion(self, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """create_completion과 같은 인자로 호출하되, 생성되는 토큰 조각을 도착하는 대로 돌려줍니다."""
+        if not self.client: await self.initialize()
+        stream = await self.client.chat.completions.create(
+            model=kwargs.get("model", self.default_model),
+            messages=messages,
+            temperature=kwargs.get("temperature", 0.7),
+            max_tokens=kwargs.get("max_tokens", 400),
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    @staticmethod
+    def _format_history(conversation_history: List[Dict]) -> str:
+        return "\n".join(f"[{msg['role']}] {msg['content']}" for msg in conversation_history)
+
+    @staticmethod
+    def _cache_key(kind: str, *parts: str) -> tuple:
+        return kind, hashlib.blake2b("\x1f".join(parts).encode(), digest_size=16).hexdigest()
+
     async def rewrite_query_with_history(self, user_message: str, conversation_history: List[Dict]) -> str:
         if not conversation_history: return user_message
-        history_str = "\n".join([f"[{msg['role']}] {msg['content']}" for msg in conversation_history])
-        prompt = f"""당신은 사용자의 대화 전체를 깊이 이해하여, 벡터 검색에 가장 적합한 검색 문장을 생성하는 '쿼리 재작성 전문가'입니다.
-### 임무
-주어진 '이전 대화 내용'과 '사용자의 마지막 메시지'를 종합하여, 사용자가 겪고 있는 문제의 핵심 상황과 감정이 모두 담긴, 단 하나의 완벽한 문장으로 재작성해야 합니다.
-### 규칙
-1. 반드시 사용자의 입장에서, 사용자가 겪는 문제 상황을 중심으로 서술해야 합니다.
-2. 단순 키워드 나열은 절대 금지됩니다.
-3. 재작성된 문장은 그 자체로 완전한 의미를 가져야 합니다.
-4. 오직 '재작성된 검색 쿼리:' 부분의 내용만 결과로 출력해야 합니다.
----
-### 실제 과제
-[이전 대화 내용]
-{history_str}
+        history_str = self._format_history(conversation_history)
+        cache_key = self._cache_key("rewrite", history_str, user_message)
+        cached = self._analysis_cache.get(cache_key)
+        if cached is not None: return cached
+        prompt = self.rewrite_prompt_prefix + f"""{history_str}
 [사용자 마지막 메시지]
 "{user_message}"
 [재작성된 검색 쿼리]
 """
         rewritten_query = await self.create_completion(
-            messages=[{"role": "user", "content": prompt}], temperature=0.0, max_tokens=200
+            messages=[{"role": "user", "content": prompt}], model=self.fast_model, temperature=0.0, max_tokens=200
         )
+        self._analysis_cache.put(cache_key, rewritten_query.strip())
         return rewritten_query.strip()
 
     async def analyze_emotion_and_context(self, text: str) -> dict:
-        emotion_list = [e.value for e in EmotionType]
-        relationship_list = [r.value for r in RelationshipType]
-        analysis_prompt = f"""다음 청소년의 메시지에서 primary_emotion과 relationship_context를 추출해줘. 반드시 아래 목록의 한글 단어 중에서만 선택해서 JSON으로 응답해야 해.
-- primary_emotion: {emotion_list}
-- relationship_context: {relationship_list}
-메시지: "{text}"
+        cache_key = self._cache_key("emotion", text)
+        cached = self._analysis_cache.get(cache_key)
+        if cached is not None: return dict(cached)
+        analysis_prompt = self.emotion_analysis_prompt_prefix + f"""메시지: "{text}"
 """
         try:
             response_content = await self.create_completion(
-                messages=[{"role": "user", "content": analysis_prompt}], temperature=0.0, max_tokens=200, json_mode=True
+                messages=[{"role": "user", "content": analysis_prompt}], model=self.fast_model, temperature=0.0, max_tokens=200, json_mode=True
             )
-            return json.loads(response_content.strip())
+            result = json.loads(response_content.strip())
+            self._analysis_cache.put(cache_key, result)  # 실패 시의 기본값은 캐시하지 않음
+            return dict(result)
         except Exception as e:
             logger.error(f"감정 분석 실패: {e}")
             return {"primary_emotion": "불안", "relationship_context": "친구"}
 
+    async def preprocess(self, user_message: str, conversation_history: List[Dict]) -> dict:
+        """감정/관계 분석과 검색 쿼리 재작성을 한 번의 JSON 호출로 처리합니다."""
+        prompt = f"""[사용자 마지막 메시지]
+"{user_message}"
+"""
+        if conversation_history:
+            history_str = self._format_history(conversation_history)
+            prompt = f"""[이전 대화 내용]
+{history_str}
+""" + prompt
+        cache_key = self._cache_key("preprocess", prompt)
+        cached = self._analysis_cache.get(cache_key)
+        if cached is not None: return dict(cached)
+        try:
+            response_content = await self.create_completion(
+                messages=[{"role": "system", "content": self.preprocess_system_prompt},
+                          {"role": "user", "content": prompt}],
+                model=self.fast_model, temperature=0.0, max_tokens=300, json_mode=True
+            )
+            result = json.loads(response_content.strip())
+            cacheable = True
+        except Exception as e:
+            logger.error(f"입력 전처리 실패: {e}")
+            result = {"primary_emotion": "불안", "relationship_context": "친구"}
+            cacheable = False  # 실패 시의 기본값은 캐시하지 않음
+        if not conversation_history or not result.get("search_query"):
+            result["search_query"] = user_message
+        if cacheable: self._analysis_cache.put(cache_key, result)
+        return dict(result)
+
     def _apply_simple_conversions(self, text: str) -> str:
-        for old, new in self.word_conversion_map.items():
-            text = text.replace(old, new)
-        words = text.split(' ')
-        converted_words = []
-        for word in words:
-            for old_ending, new_ending in sorted(self.ending_conversion_map.items(), key=lambda item: len(item[0]),
-                                                 reverse=True):
-                if word.endswith(old_ending):
-                    word = word[:-len(old_ending)] + new_ending
-                    break
-            converted_words.append(word)
-        return ' '.join(converted_words)
+        text = self._word_conversion_re.sub(lambda m: self.word_conversion_map[m.group(0)], text)
+        return self._ending_conversion_re.sub(lambda m: self.ending_conversion_map[m.group(0)], text)
 
     async def verify_rag_relevance(self, user_message: str, retrieved_doc: str) -> bool:
-        prompt = f"""사용자의 현재 메시지와 검색된 조언이 의미적으로 관련이 있는지 판단해줘. 반드시 'Yes' 또는 'No'로만 대답해.
-- 사용자 메시지: "{user_message}"
+        prompt = f"""- 사용자 메시지: "{user_message}"
 - 검색된 조언: "{retrieved_doc}"
 관련이 있는가? (Yes/No):"""
         response = await self.create_completion(
-            messages=[{"role": "user", "content": prompt}], temperature=0.0, max_tokens=5
+            messages=[{"role": "system", "content": self.relevance_system_prompt},
+                      {"role": "user", "content": prompt}],
+            model=self.fast_model, temperature=0.0, max_tokens=5
         )
         return "yes" in response.strip().lower()
 
     #  [핵심 수정] 함수 1: 답변을 구조적으로 분석하여 핵심 요소들을 추출
     async def extract_core_strategy(self, expert_response: str) -> str:
         """주어진 모범 답안을 구조적으로 분석하여 핵심 요소들을 JSON으로 추출합니다."""
-        prompt = f"""[너의 임무]
-아래 '모범 답안'을 읽고, 아래 '추출 포맷'에 맞춰 핵심 요소들을 추출해줘. 반드시 JSON 형식으로만 응답해야 해.
-
-[모범 답안]
-"{expert_response}"
-
-[추출 포맷]
-{{
-  "empathy_phrase": "<사용자의 감정에 직접 공감하는 핵심 문장>",
-  "core_suggestion": "<답변에 담긴 구체적인 제안이나 조언>",
-  "encouragement_phrase": "<마지막에 힘을 주는 격려의 메시지>"
-}}
-"""
         strategy_json = await self.create_completion(
-            messages=[{"role": "system", "content": prompt}],
-            temperature=0.0,
+            messages=[{"role": "system", "content": self.strategy_extraction_system_prompt},
+                      {"role": "user", "content": f"[모범 답안]\n\"{expert_response}\""}],
+            model=self.fast_model, temperature=0.0,
             max_tokens=500,
             json_mode=True
         )
@@ -158,43 +242,53 @@ class OpenAIClient:
     async def generate_response_from_strategy(self, core_strategy_json: str, user_situation: str,
                                               conversation_history: List[Dict]) -> Tuple[str, str]:
         """추출된 핵심 요소들을 바탕으로 최종 답변을 생성합니다."""
-        messages = [
-            {"role": "system", "content": self.teen_empathy_system_prompt},
-            *conversation_history,
-            {"role": "user", "content": user_situation}
-        ]
+        messages = self.build_strategy_messages(core_strategy_json, user_situation, conversation_history)
+        final_prompt_for_debug = "\n".join([f"[{msg['role']}] {msg['content']}" for msg in messages])
+        final_response = await self.create_completion(messages=messages, temperature=0.7, max_tokens=800)
 
+        return final_response, final_prompt_for_debug
+
+    def build_strategy_messages(self, core_strategy_json: str, user_situation: str,
+                                conversation_history: List[Dict]) -> List[Dict[str, str]]:
         final_prompt_instruction = f"""[너의 임무]
 너는 상담가 '마음이'야. 아래 '핵심 요소'들을 자연스럽게 조합하여, 너의 페르소나에 맞는 가장 따뜻하고 진심 어린 최종 답변을 생성해줘.
 
 [핵심 요소]
 {core_strategy_json}
 """
-        messages.append({"role": "system", "content": final_prompt_instruction})
-
-        final_prompt_for_debug = "\n".join([f"[{msg['role']}] {msg['content']}" for msg in messages])
-        final_response = await self.create_completion(messages=messages, temperature=0.7, max_tokens=800)
-
-        return final_response, final_prompt_for_debug
+        return [
+            {"role": "system", "content": self.teen_empathy_system_prompt},
+            *conversation_history,
+            {"role": "user", "content": user_situation},
+            {"role": "system", "content": final_prompt_instruction}
+        ]
 
-    async def create_direct_response(self, user_message: str, conversation_history: List[Dict]) -> Tuple[str, str]:
-        """RAG 실패 시 직접 생성"""
-        messages = [
+    def build_direct_messages(self, user_message: str, conversation_history: List[Dict]) -> List[Dict[str, str]]:
+        return [
             {"role": "system", "content": self.teen_empathy_system_prompt},
             *conversation_history,
             {"role": "user", "content": user_message}
         ]
+
+    async def create_direct_response(self, user_message: str, conversation_history: List[Dict]) -> Tuple[str, str]:
+        """RAG 실패 시 직접 생성"""
+        messages = self.build_direct_messages(user_message, conversation_history)
         prompt_for_debug = "\n".join([f"[{msg['role']}] {msg['content']}" for msg in messages])
         final_response = await self.create_completion(messages=messages, temperature=0.7, max_tokens=400)
         return final_response, prompt_for_debug
 
 
 _openai_client_instance = None
+_openai_client_init_lock = asyncio.Lock()
 
 
 async def get_openai_client() -> OpenAIClient:
     global _openai_client_instance
-    if _openai_client_instance is None:
-        _openai_client_instance = OpenAIClient()
-        await _openai_client_instance.initialize()
+    if _openai_client_instance is not None: return _openai_client_instance
+    # 동시 첫 요청마다 클라이언트를 만들고 연결 테스트를 반복하지 않도록 초기화 구간을 직렬화 (double-checked locking)
+    async with _openai_client_init_lock:
+        if _openai_client_instance is None:
+            instance = OpenAIClient()
+            await instance.initialize()
+            _openai_client_instance = instance
     return _openai_client_instance
\ No newline at end of file
@@ -0,0 +1,45 @@
+# src/services/reranker.py
+import asyncio
+import os
+from typing import List, Optional
+from loguru import logger
+from sentence_transformers import CrossEncoder
+
+
+class RelevanceReranker:
+    """(사용자 메시지, 후보 조언) 쌍을 한 번의 배치 추론으로 채점하는 로컬 cross-encoder"""
+
+    def __init__(self, model_name: str, threshold: float, device: str = 'cpu'):
+        self.model_name = model_name
+        self.threshold = threshold
+        self.model = CrossEncoder(model_name, device=device)
+        logger.info(f"✅ 리랭커 모델 로드 완료: {model_name} (임계값: {threshold})")
+
+    async def score(self, query: str, documents: List[str]) -> List[float]:
+        if not documents: return []
+        pairs = [(query, doc) for doc in documents]
+        scores = await asyncio.to_thread(self.model.predict, pairs, show_progress_bar=False)
+        return [float(s) for s in scores]
+
+
+_reranker_instance = None
+_reranker_load_failed = False
+_reranker_init_lock = asyncio.Lock()
+async def get_reranker() -> Optional[RelevanceReranker]:
+    """리랭커 싱글톤. 비활성화(RERANKER_MODEL='')되었거나 로드에 실패하면 None (LLM 검증으로 대체)"""
+    global _reranker_instance, _reranker_load_failed
+    if _reranker_instance is not None or _reranker_load_failed: return _reranker_instance
+    # 모델 로드는 스레드에서 수 초 걸리므로, 그 사이 들어온 요청이 같은 모델을 중복 로드하지 않도록 직렬화
+    async with _reranker_init_lock:
+        if _reranker_instance is None and not _reranker_load_failed:
+            model_name = os.getenv("RERANKER_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+            if not model_name:
+                _reranker_load_failed = True
+                return None
+            threshold = float(os.getenv("RERANKER_THRESHOLD", "0.5"))
+            try:
+                _reranker_instance = await asyncio.to_thread(RelevanceReranker, model_name, threshold)
+            except Exception as e:
+                logger.error(f"❌ 리랭커 로드 실패, LLM 검증으로 대체합니다: {e}")
+                _reranker_load_failed = True
+    return _reranker_instance
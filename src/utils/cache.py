@@ -0,0 +1,69 @@
+# src/utils/cache.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterator, Optional, Tuple
+
+
+class TTLCache:
+    """항목 수 상한(LRU)과 유효 시간(TTL)을 함께 적용하는 스레드 안전 인메모리 캐시"""
+
+    def __init__(self, max_size: int = 512, ttl_seconds: float = 3600.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _is_expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - stored_at > self.ttl_seconds
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or self._is_expired(entry[0], now):
+                if entry is not None: del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any):
+        if self.max_size <= 0: return
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        """만료되지 않은 항목의 스냅샷 (LRU 순서는 갱신하지 않음)"""
+        now = time.monotonic()
+        with self._lock:
+            return iter([(k, v) for k, (stored_at, v) in self._data.items() if not self._is_expired(stored_at, now)])
+
+    def touch(self, key: Hashable):
+        with self._lock:
+            if key in self._data: self._data.move_to_end(key)
+
+    def record(self, hit: bool):
+        """get()을 거치지 않는 조회(유사도 스캔 등)의 적중 여부를 통계에 반영"""
+        with self._lock:
+            if hit: self.hits += 1
+            else: self.misses += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"size": len(self._data), "max_size": self.max_size, "ttl_seconds": self.ttl_seconds,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "hit_rate": self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,43 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+from src.services.answer_cache import SemanticAnswerCache
+
+
+def _unit(*values):
+    v = np.asarray(values, dtype=np.float32)
+    return (v / np.linalg.norm(v)).tolist()
+
+
+@pytest.fixture
+def cache():
+    return SemanticAnswerCache(max_size=16, ttl_seconds=60, similarity_threshold=0.95, jaccard_threshold=0.5)
+
+
+def test_similar_query_with_overlapping_documents_hits(cache):
+    cache.store(1, "불안", "동급생", _unit(1, 0, 0), ["d1", "d2"], "답변")
+    assert cache.lookup(1, "불안", "동급생", _unit(1, 0.05, 0), ["d1", "d2", "d3"]) == "답변"
+    assert cache.stats()["hits"] == 1
+
+
+def test_dissimilar_query_misses(cache):
+    cache.store(1, "불안", "동급생", _unit(1, 0, 0), ["d1"], "답변")
+    assert cache.lookup(1, "불안", "동급생", _unit(1, 1, 0), ["d1"]) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_low_document_overlap_misses(cache):
+    cache.store(1, "불안", "동급생", _unit(1, 0, 0), ["d1", "d2"], "답변")
+    assert cache.lookup(1, "불안", "동급생", _unit(1, 0, 0), ["d3", "d4", "d1"]) is None
+
+
+@pytest.mark.parametrize("bucket", [(2, "불안", "동급생"), (1, "슬픔", "동급생"), (1, "불안", "부모님")])
+def test_lookup_is_scoped_to_corpus_version_emotion_and_relationship(cache, bucket):
+    cache.store(1, "불안", "동급생", _unit(1, 0, 0), ["d1"], "답변")
+    assert cache.lookup(*bucket, _unit(1, 0, 0), ["d1"]) is None
+
+
+def test_most_similar_entry_wins(cache):
+    cache.store(1, "불안", "동급생", _unit(1, 0.2, 0), ["d1"], "덜 비슷한 답변")
+    cache.store(1, "불안", "동급생", _unit(1, 0.01, 0), ["d1"], "더 비슷한 답변")
+    assert cache.lookup(1, "불안", "동급생", _unit(1, 0, 0), ["d1"]) == "더 비슷한 답변"
@@ -0,0 +1,79 @@
+import pytest
+
+from src.utils import cache as cache_module
+from src.utils.cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_get_returns_stored_value_and_counts_hits():
+    cache = TTLCache(max_size=2, ttl_seconds=60)
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_size=2, ttl_seconds=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")  # a를 최근 사용으로 갱신
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_touch_refreshes_lru_position():
+    cache = TTLCache(max_size=2, ttl_seconds=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.touch("a")
+    cache.put("c", 3)
+    assert [k for k, _ in cache.items()] == ["a", "c"]
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache(max_size=8, ttl_seconds=10)
+    cache.put("a", 1)
+    clock[0] += 5
+    assert cache.get("a") == 1
+    clock[0] += 10
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_items_skips_expired_entries(clock):
+    cache = TTLCache(max_size=8, ttl_seconds=10)
+    cache.put("old", 1)
+    clock[0] += 8
+    cache.put("new", 2)
+    clock[0] += 5
+    assert list(cache.items()) == [("new", 2)]
+
+
+def test_zero_ttl_never_expires(clock):
+    cache = TTLCache(max_size=8, ttl_seconds=0)
+    cache.put("a", 1)
+    clock[0] += 10 ** 9
+    assert cache.get("a") == 1
+
+
+def test_zero_max_size_disables_cache():
+    cache = TTLCache(max_size=0, ttl_seconds=60)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+
+def test_record_updates_hit_rate():
+    cache = TTLCache(max_size=8, ttl_seconds=60)
+    cache.record(hit=True)
+    cache.record(hit=False)
+    cache.record(hit=True)
+    assert cache.stats()["hit_rate"] == pytest.approx(2 / 3)
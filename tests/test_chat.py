@@ -0,0 +1,102 @@
+import asyncio
+import pytest
+
+chat = pytest.importorskip("src.api.chat")
+
+
+class _PreprocessCalled(Exception):
+    pass
+
+
+class _FakeOpenAIClient:
+    async def preprocess(self, message, conversation_history):
+        raise _PreprocessCalled(message)
+
+    async def create_direct_response(self, message, conversation_history):
+        return "직접 답변", []
+
+
+class _FakeConversationService:
+    async def get_or_create_session(self, session_id):
+        return session_id or "test-session"
+
+    async def get_conversation_history(self, session_id):
+        return []
+
+
+class _FakeProcessor:
+    corpus_version = 0
+    metric = "cosine"
+
+    async def embed_query(self, query):
+        return [0.0]
+
+
+@pytest.fixture
+def fake_services(monkeypatch):
+    def returns(value):
+        async def getter():
+            return value
+        return getter
+
+    monkeypatch.setattr(chat, "get_openai_client", returns(_FakeOpenAIClient()))
+    monkeypatch.setattr(chat, "get_conversation_service", returns(_FakeConversationService()))
+    monkeypatch.setattr(chat, "get_teen_empathy_processor", returns(_FakeProcessor()))
+    monkeypatch.setattr(chat, "get_reranker", returns(None))
+    monkeypatch.setattr(chat, "get_answer_cache", returns(None))
+
+
+@pytest.mark.parametrize("message", ["안녕", "ㅎㅇ", "고마워~", "ㅋㅋㅋ", "ok"])
+def test_greetings_are_trivial(message):
+    assert chat._TRIVIAL_MESSAGE_RE.match(message)
+
+
+@pytest.mark.parametrize("message", ["ㅠㅠ", "ㅜㅜ", "ㅠㅠㅠ...", "친구랑 싸웠어"])
+def test_distress_messages_are_not_trivial(message):
+    assert chat._TRIVIAL_MESSAGE_RE.match(message) is None
+
+
+def test_crying_emoticon_runs_full_pipeline(fake_services):
+    # 우는 이모티콘은 감정 표현이므로 전처리(감정 분석)를 거쳐야 함
+    with pytest.raises(_PreprocessCalled):
+        asyncio.run(chat.run_pipeline("test-session", "ㅠㅠ"))
+
+
+def test_greeting_skips_preprocessing(fake_services):
+    result = asyncio.run(chat.run_pipeline("test-session", "안녕"))
+    assert result["response"] == "직접 답변"
+
+
+class _FakeVerifier:
+    """관련성 검증 호출을 기록하고 항상 관련 있다고 답함"""
+
+    def __init__(self):
+        self.verified = []
+
+    def _apply_simple_conversions(self, text):
+        return text
+
+    async def verify_rag_relevance(self, message, doc):
+        self.verified.append(doc)
+        return True
+
+
+def _candidates(*scores):
+    return [{"system_response": f"답변{i}", "similarity_score": score} for i, score in enumerate(scores)]
+
+
+def test_similarity_tiers_accept_and_reject_without_llm():
+    verifier = _FakeVerifier()
+    selected, _, _ = asyncio.run(chat._verify_candidates(verifier, None, "질문", _candidates(0.9, 0.3)))
+    assert selected == 0 and verifier.verified == []
+    selected, _, _ = asyncio.run(chat._verify_candidates(verifier, None, "질문", _candidates(0.6, 0.3)))
+    assert selected == 0 and verifier.verified == ["답변0"]
+
+
+def test_non_cosine_metric_skips_similarity_tiers():
+    # l2의 1/(1+d) 점수에는 코사인 기준 임계값이 의미가 없으므로 모든 후보를 LLM으로 검증
+    verifier = _FakeVerifier()
+    selected, _, _ = asyncio.run(chat._verify_candidates(
+        verifier, None, "질문", _candidates(0.9, 0.3), similarity_tiers=False
+    ))
+    assert selected == 0 and verifier.verified == ["답변0", "답변1"]
@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+
+pytest.importorskip("loguru")
+from src.services.conversation_service import ConversationService
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setenv("CONVERSATION_DB_PATH", str(tmp_path / "conversations.db"))
+    return ConversationService()
+
+
+def _history(service, session_id="s1", limit=6):
+    return asyncio.run(service.get_conversation_history(session_id, limit=limit))
+
+
+def _save(service, user, assistant, session_id="s1"):
+    asyncio.run(service.save_conversation_turn(session_id, user, assistant))
+
+
+def test_history_keeps_user_before_assistant_within_a_turn(service):
+    # 한 턴의 두 행은 timestamp가 같으므로 삽입 순서(id)로 정렬되어야 함
+    _save(service, "안녕", "안녕! 무슨 일 있었어?")
+    _save(service, "친구랑 싸웠어", "많이 속상했겠다.")
+    assert _history(service) == [
+        {"role": "user", "content": "안녕"},
+        {"role": "assistant", "content": "안녕! 무슨 일 있었어?"},
+        {"role": "user", "content": "친구랑 싸웠어"},
+        {"role": "assistant", "content": "많이 속상했겠다."},
+    ]
+
+
+def test_history_is_scoped_to_session(service):
+    _save(service, "a", "b", session_id="s1")
+    _save(service, "c", "d", session_id="s2")
+    assert [m["content"] for m in _history(service, "s2")] == ["c", "d"]
+
+
+def test_history_char_budget_keeps_newest_messages(service):
+    service.history_char_budget = 25
+    _save(service, "가" * 10, "나" * 10)
+    _save(service, "다" * 10, "라" * 10)
+    # 최신부터 20자까지만 들어가고 다음 10자는 예산(25자)을 넘으므로 잘림
+    assert [m["content"] for m in _history(service)] == ["다" * 10, "라" * 10]
+
+
+def test_history_char_budget_always_keeps_newest_message(service):
+    service.history_char_budget = 5
+    _save(service, "짧게", "아주 긴 답변입니다. 예산보다 훨씬 길어요.")
+    assert _history(service) == [{"role": "assistant", "content": "아주 긴 답변입니다. 예산보다 훨씬 길어요."}]
+
+
+def test_history_char_budget_zero_only_applies_limit(service):
+    service.history_char_budget = 0
+    for i in range(4):
+        _save(service, "질문" * 500, f"답변{i}" * 500)
+    history = _history(service, limit=6)
+    assert len(history) == 6
+    assert history[-1]["content"] == "답변3" * 500
@@ -0,0 +1,50 @@
+import os
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("optimum.onnxruntime")
+sentence_transformers = pytest.importorskip("sentence_transformers")
+onnx_encoder = pytest.importorskip("src.core.onnx_encoder")
+
+MODEL_NAME = os.getenv("EMBEDDING_MODEL", "jhgan/ko-sbert-multitask")
+
+SENTENCES = [
+    "친구랑 싸워서 학교 가기 싫어요.",
+    "엄마가 제 말을 하나도 안 들어줘요.",
+    "시험을 망쳐서 너무 불안해요.",
+    "요즘 아무것도 하기 싫고 계속 잠만 자요.",
+    "단짝이 다른 친구랑만 놀아서 서운해요.",
+]
+
+
+@pytest.fixture(scope="module")
+def encoders(tmp_path_factory):
+    cache_dir = os.getenv("HF_HOME") or str(tmp_path_factory.mktemp("hf"))
+    try:
+        onnx = onnx_encoder.OnnxSentenceEncoder(MODEL_NAME, cache_dir=cache_dir)
+        torch_model = sentence_transformers.SentenceTransformer(MODEL_NAME, cache_folder=cache_dir, device="cpu")
+    except Exception as e:  # 모델을 내려받을 수 없는 환경
+        pytest.skip(f"임베딩 모델을 불러올 수 없음: {e}")
+    return onnx, torch_model
+
+
+def test_onnx_matches_torch_embeddings(encoders):
+    onnx, torch_model = encoders
+    onnx_embeddings = onnx.encode(SENTENCES, normalize_embeddings=True)
+    torch_embeddings = torch_model.encode(SENTENCES, normalize_embeddings=True)
+    assert onnx_embeddings.shape == torch_embeddings.shape
+    cosine = (onnx_embeddings * torch_embeddings).sum(axis=1)
+    assert cosine.min() >= 0.99
+
+
+def test_onnx_uses_sentence_transformer_max_seq_length(encoders):
+    onnx, torch_model = encoders
+    assert onnx.max_seq_length == torch_model.max_seq_length
+
+
+def test_onnx_encode_preserves_input_order(encoders):
+    onnx, _ = encoders
+    batched = onnx.encode(SENTENCES, batch_size=2, normalize_embeddings=True)
+    single = np.stack([onnx.encode(s, normalize_embeddings=True)[0] for s in SENTENCES])
+    assert batched == pytest.approx(single, abs=1e-5)
@@ -0,0 +1,178 @@
+import asyncio
+import pytest
+
+np = pytest.importorskip("numpy")
+chromadb = pytest.importorskip("chromadb")
+vector_store = pytest.importorskip("src.core.vector_store")
+
+
+def _make_store(tmp_path, metric="cosine"):
+    store = vector_store.ChromaVectorStore(collection_name=f"test_{metric}", metric=metric)
+    store.client = chromadb.PersistentClient(path=str(tmp_path))
+    store.collection = vector_store.get_or_create_hnsw_collection(store.client, store.collection_name, metric)
+    return store
+
+
+@pytest.fixture
+def unnormalized_store(tmp_path):
+    # 기존 컬렉션처럼 정규화하지 않은 벡터 (행마다 길이가 다름)
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(300, 16)).astype(np.float32) * rng.uniform(0.2, 5.0, size=(300, 1)).astype(np.float32)
+    store = _make_store(tmp_path)
+    store.collection.add(
+        ids=[f"doc{i}" for i in range(len(embeddings))],
+        embeddings=embeddings.tolist(),
+        documents=[f"문서 {i}" for i in range(len(embeddings))],
+        metadatas=[{"emotion": ["불안", "슬픔", "분노"][i % 3]} for i in range(len(embeddings))],
+    )
+    return store
+
+
+def _search(store, query, brute_force_max_docs, **kwargs):
+    store.brute_force_max_docs = brute_force_max_docs
+    return asyncio.run(store.search("", top_k=10, query_embedding=query, **kwargs))
+
+
+@pytest.mark.parametrize("filter_metadata", [None, {"emotion": "슬픔"}])
+def test_brute_force_matches_chroma_on_unnormalized_vectors(unnormalized_store, filter_metadata):
+    query = np.random.default_rng(1).normal(size=16).astype(np.float32)
+    query = (query / np.linalg.norm(query)).tolist()
+    hnsw = _search(unnormalized_store, query, 0, filter_metadata=filter_metadata)
+    brute = _search(unnormalized_store, query, 1000, filter_metadata=filter_metadata)
+    assert [r.document_id for r in brute] == [r.document_id for r in hnsw]
+    assert [r.score for r in brute] == pytest.approx([r.score for r in hnsw], abs=1e-4)
+
+
+def test_get_or_create_hnsw_collection_creates_once(tmp_path):
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    created = vector_store.get_or_create_hnsw_collection(client, "fresh", "cosine")
+    assert created.metadata["hnsw:space"] == "cosine"
+    assert created.metadata["hnsw:search_ef"] == vector_store.HNSW_PARAMS["hnsw:search_ef"]
+    # 기존 컬렉션은 생성 당시 설정 그대로 열림
+    client.create_collection(name="legacy", metadata={"hnsw:space": "ip"})
+    existing = vector_store.get_or_create_hnsw_collection(client, "legacy", "cosine")
+    assert existing.metadata == {"hnsw:space": "ip"}
+
+
+class _FakeEncoder:
+    """문장 길이로 만든 2차원 임베딩을 돌려주고 호출 횟수를 기록"""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, sentences, batch_size=32, normalize_embeddings=False, **kwargs):
+        self.calls.append(list(sentences))
+        return np.array([[len(s), 1.0] for s in sentences], dtype=np.float32)
+
+
+def _batching_store(window_seconds):
+    store = vector_store.ChromaVectorStore(collection_name="test_batching")
+    store.embedding_model = _FakeEncoder()
+    store.query_batch_window = window_seconds
+    return store
+
+
+def test_query_batch_window_defaults_to_off(monkeypatch):
+    monkeypatch.delenv("QUERY_BATCH_WINDOW_MS", raising=False)
+    assert vector_store.ChromaVectorStore(collection_name="test_default").query_batch_window == 0
+
+
+def test_concurrent_queries_share_one_encode_call():
+    store = _batching_store(0.01)
+
+    async def run():
+        return await asyncio.gather(store.embed_query("가"), store.embed_query("가나"), store.embed_query("가"))
+
+    assert asyncio.run(run()) == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0]]
+    assert store.embedding_model.calls == [["가", "가나"]]
+
+
+@pytest.mark.parametrize("cancel_after", [0, 0.01])  # flush 시작 전 / sleep 중 취소
+def test_cancelled_flush_does_not_hang_later_queries(cancel_after):
+    store = _batching_store(0.05)
+
+    async def run():
+        waiting = asyncio.create_task(store.embed_query("가"))
+        await asyncio.sleep(cancel_after)
+        store._query_flush_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(waiting, timeout=1)
+        assert store._query_flush_task is None and not store._pending_queries
+        return await asyncio.wait_for(store.embed_query("가나"), timeout=1)
+
+    assert asyncio.run(run()) == [2.0, 1.0]
+
+
+@pytest.mark.parametrize("metric", ["cosine", "l2", "ip"])
+def test_results_are_already_score_descending(tmp_path, metric):
+    # search()가 다시 정렬하지 않는 근거: Chroma 거리는 오름차순이고 거리→유사도 변환은 단조 감소
+    rng = np.random.default_rng(2)
+    embeddings = rng.normal(size=(200, 8)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    store = _make_store(tmp_path, metric)
+    store.collection.add(ids=[str(i) for i in range(200)], embeddings=embeddings.tolist(),
+                         metadatas=[{"i": i} for i in range(200)])
+    distances = store.collection.query(query_embeddings=[embeddings[0].tolist()], n_results=20)["distances"][0]
+    assert distances == sorted(distances)
+    scores = store._calculate_similarity_from_distance(distances)
+    assert scores == sorted(scores, reverse=True)
+    grid = np.linspace(0.0, 4.0, 81).tolist()
+    grid_scores = store._calculate_similarity_from_distance(grid)
+    assert all(a >= b for a, b in zip(grid_scores, grid_scores[1:]))
+
+
+@pytest.fixture
+def ingest_store(tmp_path):
+    store = _make_store(tmp_path)
+    store.embedding_model = _FakeEncoder()
+    batches = []
+
+    class RecordingCollection:
+        """add() 호출마다 배치 크기를 기록하고 나머지는 실제 컬렉션에 위임"""
+
+        def __init__(self, collection):
+            self._collection = collection
+
+        def add(self, **kwargs):
+            batches.append(len(kwargs["ids"]))
+            return self._collection.add(**kwargs)
+
+        def __getattr__(self, name):
+            return getattr(self._collection, name)
+
+    store.collection = RecordingCollection(store.collection)
+    return store, batches
+
+
+def _documents(texts):
+    from src.models.vector_models import DocumentInput
+    return (DocumentInput(content=text, metadata={"n": i}, document_id=f"doc{i}") for i, text in enumerate(texts))
+
+
+def test_add_documents_clamps_batches_to_client_max_batch_size(ingest_store, monkeypatch):
+    store, batches = ingest_store
+    store.add_batch_size = 10
+    monkeypatch.setattr(store, "client", type("Client", (), {"max_batch_size": 4})())
+    ids = asyncio.run(store.add_documents(_documents([f"문장{i}" for i in range(10)])))
+    assert ids == [f"doc{i}" for i in range(10)]
+    assert batches == [4, 4, 2]
+    assert store.collection.count() == 10
+
+
+def test_add_documents_encodes_duplicate_texts_once(ingest_store):
+    store, _ = ingest_store
+    texts = ["가", "가나", "가", "가나다", "가나"]
+    asyncio.run(store.add_documents(_documents(texts)))
+    assert store.embedding_model.calls == [["가", "가나", "가나다"]]
+    stored = store.collection.get(ids=["doc0", "doc2", "doc4"], include=["embeddings", "metadatas"])
+    by_id = dict(zip(stored["ids"], stored["embeddings"]))
+    assert by_id["doc0"] == by_id["doc2"] == [1.0, 1.0]
+    assert by_id["doc4"] == [2.0, 1.0]
+    assert all(m["content_length"] == len(texts[int(m["n"])]) for m in stored["metadatas"])
+
+
+def test_add_documents_bumps_corpus_version(ingest_store):
+    store, _ = ingest_store
+    version = store.corpus_version
+    asyncio.run(store.add_documents(_documents(["가"])))
+    assert store.corpus_version == version + 1